@@ -1,7 +1,28 @@
+# Both containers share the SQLite database (instance/) and the uploads
+# directory, so the worker sees the images the web container stores
 podman run -d \
   -p 8000:8000 \
   --name twflagdesign \
+  --restart=always \
   --env-file .env \
   -v $(pwd)/src/instance:/app/src/instance \
+  -v $(pwd)/src/app/static/uploads:/app/src/app/static/uploads \
   -v $(pwd)/log:/app/log \
-  localhost/twflagdesign
\ No newline at end of file
+  localhost/twflagdesign
+
+# Background job worker (thumbnails, variants, fingerprints, search index).
+# It reads and writes the same uploads directory as the web container.
+# Restarted if it exits; the health check fails, and the container is
+# restarted, when queued jobs have waited longer than JOB_STALL_AFTER
+podman run -d \
+  --name twflagdesign-worker \
+  --restart=always \
+  --health-cmd 'flask jobs --check' \
+  --health-interval 60s \
+  --health-on-failure=restart \
+  --env-file .env \
+  -v $(pwd)/src/instance:/app/src/instance \
+  -v $(pwd)/src/app/static/uploads:/app/src/app/static/uploads \
+  -v $(pwd)/log:/app/log \
+  localhost/twflagdesign \
+  flask run-worker
@@ -4,8 +4,9 @@ from flask_migrate import Migrate
 from flask_login import LoginManager
 from authlib.integrations.flask_client import OAuth
 from config import Config
+from app.database import RoutingSession, configure_engines, init_engines
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
@@ -16,7 +17,9 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    configure_engines(app)
     db.init_app(app)
+    init_engines(app, db)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     oauth.init_app(app)
@@ -35,6 +38,24 @@ def create_app(config_class=Config):
 
     from app.auth import bp as auth_bp
     app.register_blueprint(auth_bp, url_prefix='/auth')
+
+    from app.fragments import init_fragment_cache
+    init_fragment_cache(app)
+
+    from app.users import init_user_cache
+    init_user_cache(app)
+
+    from app.assets import init_assets
+    init_assets(app)
+
+    from app.images import image_variants
+    app.add_template_global(image_variants)
+
+    from app.commands import register_commands
+    register_commands(app)
+
+    from app.fingerprints import init_fingerprint_index
+    init_fingerprint_index(app)
     
     # Register blueprints (to be created)
     # from app.designs import bp as designs_bp
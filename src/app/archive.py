@@ -0,0 +1,187 @@
+import glob
+import gzip
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from flask import current_app
+from app.uploads import hash_file
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:  # only needed to (re)parse the Takeout; reading the index works without it
+    BeautifulSoup = None
+
+# Parsed index of the Google+ Takeout HTML, shared by the import and
+# reconciliation scripts. Each file is parsed once; later runs only
+# reparse files whose size or mtime changed. Stored as gzipped JSON in
+# the instance folder.
+
+INDEX_VERSION = 1
+INDEX_FILENAME = 'takeout_index.json.gz'
+
+
+def _find_image(soup, fpath, root):
+    # Post photo, falling back to the media attachment. Takeout links it
+    # relative to the HTML file; older copies have it flat in the archive
+    img_tag = soup.find('img', class_='u-photo') or soup.find('img', class_='media')
+    if not img_tag or not img_tag.get('src'):
+        return None
+    src = img_tag['src']
+    for candidate in (os.path.join(os.path.dirname(fpath), src), os.path.join(root, os.path.basename(src))):
+        if os.path.isfile(candidate):
+            return os.path.relpath(candidate, root)
+    return None
+
+
+def parse_html_file(fpath, root, parser='html.parser'):
+    """Everything the scripts use from one Takeout post, as a plain dict."""
+    with open(fpath, 'r', encoding='utf-8') as f:
+        soup = BeautifulSoup(f, parser)
+
+    content_div = soup.find('div', class_='main-content')
+    content = content_div.get_text('\n').strip() if content_div else ""
+
+    # The HTML title tag is generic; Takeout names files "YYYYMMDD - <first words>"
+    filename_base = os.path.basename(fpath).replace('.html', '')
+    if ' - ' in filename_base:
+        title_candidate = filename_base.split(' - ', 1)[1]
+    else:
+        title_candidate = filename_base
+    if not content:
+        content = title_candidate
+
+    author_span = soup.find('span', itemprop='name')
+
+    # Format: 2014-06-08T06:53:14+0000, stored as naive UTC
+    created_at = None
+    date_span = soup.find('span', itemprop='dateCreated')
+    if date_span:
+        try:
+            created_at = datetime.strptime(date_span.get_text().strip().split('+')[0], "%Y-%m-%dT%H:%M:%S")
+        except ValueError:
+            pass
+
+    # "Shared to the community 自己的國旗自己畫 - <category>"
+    category = None
+    visibility = soup.find('div', class_='visibility')
+    if visibility:
+        text = visibility.get_text().strip()
+        if '-' in text:
+            category = text.split('-')[-1].strip()
+
+    return {
+        'title': title_candidate[:100], # Truncate to match DB limit
+        'content': content,
+        'author_name': author_span.get_text().strip() if author_span else "Unknown",
+        'created_at': created_at,
+        'category': category,
+        'image_path': _find_image(soup, fpath, root),
+    }
+
+
+def _parse_entry(args):
+    # Pool worker: parse plus the stat/hash the index is keyed on
+    fpath, root, parser = args
+    st = os.stat(fpath)
+    entry = parse_html_file(fpath, root, parser)
+    entry.update(size=st.st_size, mtime=st.st_mtime, sha256=hash_file(fpath))
+    return os.path.relpath(fpath, root), entry
+
+
+class ArchiveIndex:
+    """Parsed Takeout posts, refreshed incrementally.
+
+    entries() yields dicts with title, content (as in the HTML, not
+    normalised), author_name, created_at (None if missing), category,
+    image_path and path (both joined with root, image_path may be None),
+    size, mtime and sha256.
+    """
+
+    def __init__(self, root, index_path=None):
+        self.root = root
+        self.index_path = index_path or os.path.join(current_app.instance_path, INDEX_FILENAME)
+        self._entries = {}  # path relative to root -> entry
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.index_path):
+            return
+        with gzip.open(self.index_path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != INDEX_VERSION or data.get('root') != os.path.abspath(self.root):
+            return  # rebuilt on refresh
+        for entry in data['entries'].values():
+            if entry['created_at']:
+                entry['created_at'] = datetime.fromisoformat(entry['created_at'])
+        self._entries = data['entries']
+
+    def save(self):
+        entries = {path: dict(entry, created_at=entry['created_at'].isoformat() if entry['created_at'] else None)
+                   for path, entry in self._entries.items()}
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        temp_path = self.index_path + '.tmp'
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'root': os.path.abspath(self.root), 'entries': entries},
+                      f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, self.index_path)
+
+    def refresh(self, workers=None, parser='html.parser'):
+        """Reparse new and modified files, drop deleted ones, and save.
+
+        Returns (parsed, removed, seconds). Parsing fans out over a
+        process pool when there is more than a handful of files.
+        """
+        started = time.perf_counter()
+        current = {}
+        for fpath in glob.glob(os.path.join(self.root, '*.html')):
+            current[os.path.relpath(fpath, self.root)] = fpath
+        removed = [path for path in self._entries if path not in current]
+        for path in removed:
+            del self._entries[path]
+
+        stale = []
+        for path, fpath in current.items():
+            entry = self._entries.get(path)
+            st = os.stat(fpath)
+            if entry is None or entry['size'] != st.st_size or entry['mtime'] != st.st_mtime:
+                stale.append(fpath)
+
+        if stale:
+            if BeautifulSoup is None:
+                raise RuntimeError("Parsing the Takeout needs beautifulsoup4 (pip install beautifulsoup4).")
+            jobs = [(fpath, self.root, parser) for fpath in sorted(stale)]
+            workers = workers or os.cpu_count() or 1
+            if workers > 1 and len(jobs) > 20:
+                # spawn: forked workers would inherit the app's open SQLite connections
+                with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                    results = list(pool.map(_parse_entry, jobs, chunksize=max(1, len(jobs) // (workers * 8))))
+            else:
+                results = [_parse_entry(job) for job in jobs]
+            self._entries.update(results)
+
+        if stale or removed:
+            self.save()
+        return len(stale), len(removed), time.perf_counter() - started
+
+    def entries(self):
+        for path in sorted(self._entries):
+            entry = self._entries[path]
+            yield dict(entry,
+                       path=os.path.join(self.root, path),
+                       image_path=os.path.join(self.root, entry['image_path']) if entry['image_path'] else None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def load_index(root, workers=None, parser='html.parser'):
+    # Open and refresh in one go, reporting what was reparsed
+    index = ArchiveIndex(root)
+    parsed, removed, seconds = index.refresh(workers=workers, parser=parser)
+    if parsed or removed:
+        rate = f", {parsed / seconds:.1f} files/sec" if parsed and seconds else ""
+        print(f"Archive index: reparsed {parsed} files, dropped {removed} ({seconds:.1f}s{rate}).")
+    return index
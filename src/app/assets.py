@@ -0,0 +1,132 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from flask import current_app, request, send_from_directory, url_for, make_response, abort
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # only gzip copies are built without it
+    brotli = None
+
+# Files fingerprinted by `flask build-assets` into static/dist/. Templates
+# link them through asset_url(), which falls back to the plain file when
+# no manifest has been built (development).
+ASSETS = [
+    'css/base.css',
+    'css/variables.css',
+    'js/main.js',
+    'js/autocomplete.js',
+    'img/logo.png',
+    'img/favicon.ico',
+]
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = ('.css', '.js', '.svg')
+
+ONE_YEAR = 365 * 24 * 3600
+# Names that can never change contents: hashed assets, content-addressed
+# uploads (app.uploads) and their variants
+IMMUTABLE = re.compile(r'^(dist/.+\.[0-9a-f]{12}\.\w+|uploads/(variants/)?[0-9a-f]{64}(_\w+)?\.\w+)$')
+
+_manifest = {}
+
+
+def build_assets(static_folder):
+    """Write hashed copies (plus .gz/.br for text) and the manifest. Returns the manifest."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    for name in ASSETS:
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            data = f.read()
+        stem, ext = os.path.splitext(name)
+        hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+        target = os.path.join(dist, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        if ext in COMPRESSIBLE:
+            with open(target + '.gz', 'wb') as f:
+                # mtime=0 keeps the .gz byte-identical across builds
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(target + '.br', 'wb') as f:
+                    f.write(brotli.compress(data, quality=11))
+        manifest[name] = f"{DIST_DIR}/{hashed}"
+
+    with open(os.path.join(dist, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    path = os.path.join(static_folder, DIST_DIR, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def asset_url(name):
+    return url_for('static', filename=_manifest.get(name, name))
+
+
+def _precompressed(filename):
+    # Pick a .br/.gz sibling the client accepts; returns (filename, encoding)
+    if not filename.endswith(COMPRESSIBLE):
+        return filename, None
+    accepted = request.accept_encodings
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[encoding] and os.path.exists(os.path.join(current_app.static_folder, filename + suffix)):
+            return filename + suffix, encoding
+    return filename, None
+
+
+def serve_static(filename):
+    """Replacement for Flask's static view.
+
+    Hashed assets and content-addressed uploads get a one-year immutable
+    Cache-Control. With STATIC_OFFLOAD = 'x-accel-redirect' (nginx) the
+    response only names the file under STATIC_ACCEL_PREFIX and the proxy
+    sends the bytes; 'x-sendfile' (Apache, lighttpd) goes through Flask's
+    USE_X_SENDFILE, set in init_assets().
+    """
+    static_folder = current_app.static_folder
+    path = safe_join(static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    served, encoding = _precompressed(filename)
+    immutable = bool(IMMUTABLE.match(filename))
+    max_age = ONE_YEAR if immutable else current_app.config['STATIC_MAX_AGE']
+    # Type of the original name, not of the .gz/.br sibling
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    if current_app.config.get('STATIC_OFFLOAD') == 'x-accel-redirect':
+        response = make_response('')
+        response.mimetype = mimetype
+        response.headers['X-Accel-Redirect'] = current_app.config['STATIC_ACCEL_PREFIX'].rstrip('/') + '/' + served
+    else:
+        response = send_from_directory(static_folder, served, mimetype=mimetype, max_age=max_age)
+
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if filename.endswith(COMPRESSIBLE):
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    return response
+
+
+def init_assets(app):
+    global _manifest
+    _manifest = load_manifest(app.static_folder)
+    app.config['USE_X_SENDFILE'] = app.config.get('STATIC_OFFLOAD') == 'x-sendfile'
+    app.add_template_global(asset_url)
+    app.view_functions['static'] = serve_static
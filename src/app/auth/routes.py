@@ -3,6 +3,7 @@ from flask_login import login_user, logout_user, current_user
 from app import db, oauth
 from app.auth import bp
 from app.models import User
+from app.users import CachedUser, user_cache
 
 @bp.route('/login')
 def login():
@@ -29,6 +30,9 @@ def authorize():
                 
             db.session.add(user)
             db.session.commit()
+        # Start this worker from the row just read. Logging in changes
+        # nothing, so the other workers' caches (invalidate()) stay
+        user_cache.set(CachedUser(user.id, user.name, user.is_admin, user.profile_pic))
         login_user(user)
         return redirect(url_for('main.index'))
     return redirect(url_for('main.index'))
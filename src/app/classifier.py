@@ -0,0 +1,99 @@
+from collections import deque
+
+# Below this many keywords, `keyword in text` loops (C substring search)
+# beat walking the text in Python; bench_classifier.py puts the crossover
+# at 70-80 keywords when nothing matches
+AUTOMATON_MIN_KEYWORDS = 100
+
+
+class KeywordClassifier:
+    """Ordered keyword rules: the first rule with a keyword in the text wins.
+
+    rules is a list of (keywords, label). Small tables (the import
+    scripts' have 20-30 keywords) are checked with substring loops. From
+    min_keywords up, all keywords share one Aho-Corasick automaton, so
+    the cost is one walk over the text however many keywords there are.
+    Both give the same answer.
+    """
+
+    def __init__(self, rules, case_sensitive=False, min_keywords=AUTOMATON_MIN_KEYWORDS):
+        self.labels = [label for _, label in rules]
+        self.case_sensitive = case_sensitive
+        self._rules = [[self._fold(k) for k in keywords if k] for keywords, _ in rules]
+        self.use_automaton = sum(len(keywords) for keywords in self._rules) >= min_keywords
+        if self.use_automaton:
+            self._build()
+
+    def _build(self):
+        # Node i: _goto[i] maps char -> node, _fail[i] is the longest proper
+        # suffix that is also a prefix, _best[i] the highest-priority rule
+        # (lowest index) of any keyword ending here or at a suffix of here
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [None]
+
+        for priority, keywords in enumerate(self._rules):
+            for keyword in keywords:
+                node = 0
+                for char in keyword:
+                    nxt = self._goto[node].get(char)
+                    if nxt is None:
+                        nxt = len(self._goto)
+                        self._goto[node][char] = nxt
+                        self._goto.append({})
+                        self._fail.append(0)
+                        self._best.append(None)
+                    node = nxt
+                if self._best[node] is None or priority < self._best[node]:
+                    self._best[node] = priority
+
+        # Breadth-first so a node's fail target is finished before it
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                inherited = self._best[self._fail[child]]
+                if inherited is not None and (self._best[child] is None or inherited < self._best[child]):
+                    self._best[child] = inherited
+
+    def _fold(self, text):
+        return text if self.case_sensitive else text.lower()
+
+    def match(self, text):
+        """Index of the winning rule, or None."""
+        if not self.use_automaton:
+            text = self._fold(text)
+            for priority, keywords in enumerate(self._rules):
+                for keyword in keywords:
+                    if keyword in text:
+                        return priority
+            return None
+
+        goto, fail, best = self._goto, self._fail, self._best
+        root = goto[0]
+        winner = None
+        node = 0
+        for char in self._fold(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0) if node else root.get(char, 0)
+            found = best[node]
+            if found is not None and (winner is None or found < winner):
+                winner = found
+                if winner == 0:
+                    break  # nothing can outrank the first rule
+        return winner
+
+    def classify(self, text, default=None):
+        """Label of the winning rule, or default."""
+        winner = self.match(text)
+        return self.labels[winner] if winner is not None else default
+
+    def classify_many(self, texts, default=None):
+        return [self.classify(text, default) for text in texts]
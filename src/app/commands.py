@@ -0,0 +1,140 @@
+import os
+import shutil
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from app import db
+from app.models import Design, Post
+from app.images import generate_variants, upload_dir
+from app.fragments import bump_version
+from app.jobs import run_worker, queue_stats, retry_failed, enqueue
+from app.uploads import rebuild_blobs, blob_stats
+from app.fingerprints import backfill_fingerprints, load_tree, duplicate_clusters, DEFAULT_RADIUS
+from app.assets import build_assets, DIST_DIR, brotli
+
+
+def register_commands(app):
+    app.cli.add_command(backfill_variants)
+    app.cli.add_command(run_worker_command)
+    app.cli.add_command(jobs_command)
+    app.cli.add_command(backfill_blobs)
+    app.cli.add_command(dedupe_images)
+    app.cli.add_command(build_assets_command)
+
+
+@click.command('backfill-variants')
+@click.option('--force', is_flag=True, help='Rebuild variants that already exist.')
+@with_appcontext
+def backfill_variants(force):
+    """Build resized variants for everything in static/uploads."""
+    built = failed = 0
+    for name in sorted(os.listdir(upload_dir())):
+        if name.startswith('.') or not os.path.isfile(os.path.join(upload_dir(), name)):
+            continue
+        if generate_variants(name, force=force):
+            built += 1
+        else:
+            failed += 1
+            click.echo(f"Skipped {name}")
+
+    # Cached cards still point at the originals; bump their versions so
+    # every worker re-renders them with srcset
+    for model in (Design, Post):
+        for obj in model.query.filter(model.image_filename.isnot(None)):
+            bump_version(obj)
+    db.session.commit()
+
+    click.echo(f"Built variants for {built} uploads, skipped {failed}.")
+
+
+@click.command('run-worker')
+@click.option('--poll-interval', default=1.0, show_default=True, help='Seconds to sleep when the queue is empty.')
+@click.option('--burst', is_flag=True, help='Exit once the queue is empty.')
+@with_appcontext
+def run_worker_command(poll_interval, burst):
+    """Process background jobs (thumbnails, search index updates)."""
+    run_worker(poll_interval=poll_interval, burst=burst)
+
+
+@click.command('jobs')
+@click.option('--retry-failed', 'retry', is_flag=True, help='Put failed jobs back on the queue.')
+@click.option('--check', is_flag=True, help='Exit with status 1 if the queue is stalled (for health checks).')
+@with_appcontext
+def jobs_command(retry, check):
+    """Show the job queue backlog."""
+    if retry:
+        click.echo(f"Requeued {retry_failed()} failed jobs.")
+    stats = queue_stats()
+    click.echo(f"queued: {stats['queued']}  running: {stats['running']}  "
+               f"done: {stats['done']}  failed: {stats['failed']}")
+    if stats['oldest_queued_seconds'] is not None:
+        click.echo(f"oldest queued job: {stats['oldest_queued_seconds']}s ago")
+    if stats['stalled']:
+        click.echo("STALLED: no worker has picked up the queue; is `flask run-worker` running?")
+    for failure in stats['recent_failures']:
+        click.echo(f"  #{failure['id']} {failure['kind']} {failure['payload']} "
+                   f"({failure['attempts']} attempts): {failure['error']}")
+    if check and stats['stalled']:
+        raise SystemExit(1)
+
+
+@click.command('backfill-blobs')
+@with_appcontext
+def backfill_blobs():
+    """Move uploads to content-addressed names and rebuild reference counts."""
+    blobs, duplicates, missing, renamed = rebuild_blobs()
+    # Variants were built under the old names
+    for filename in set(renamed.values()):
+        enqueue('image_variants', filename=filename)
+    db.session.commit()
+
+    stats = blob_stats()
+    click.echo(f"{blobs} blobs ({stats['bytes'] // 1024} KiB) for {stats['references']} references; "
+               f"renamed {len(renamed)}, removed {duplicates} duplicate files, {missing} missing.")
+
+
+@click.command('dedupe-images')
+@click.option('--radius', default=DEFAULT_RADIUS, show_default=True,
+              help='Max Hamming distance (of 384 bits) between duplicate images.')
+@click.option('--refresh', is_flag=True, help='Recompute every fingerprint, not just missing or stale ones.')
+@with_appcontext
+def dedupe_images(radius, refresh):
+    """Report clusters of near-identical design images."""
+    computed, unreadable = backfill_fingerprints(force=refresh)
+    db.session.commit()
+    if computed or unreadable:
+        click.echo(f"Fingerprinted {computed} designs ({unreadable} images unreadable or missing).")
+
+    started = time.perf_counter()
+    tree = load_tree()
+    loaded = time.perf_counter()
+    clusters = duplicate_clusters(radius, tree=tree)
+    searched = time.perf_counter()
+    click.echo(f"{len(tree)} fingerprints: tree built in {(loaded - started) * 1000:.1f} ms, "
+               f"all-pairs radius-{radius} search in {(searched - loaded) * 1000:.1f} ms.")
+
+    designs = {d.id: d for d in Design.query.filter(Design.id.in_([i for ids in clusters for i in ids]))}
+    for n, ids in enumerate(clusters, 1):
+        click.echo(f"\nCluster {n} ({len(ids)} designs):")
+        for design_id in ids:
+            d = designs[design_id]
+            click.echo(f"  #{d.id} {d.public_id} {d.created_at:%Y-%m-%d} {d.title[:40]!r} {d.image_filename}")
+    click.echo(f"\n{len(clusters)} clusters, {sum(len(ids) for ids in clusters)} designs.")
+
+
+@click.command('build-assets')
+@click.option('--clean', is_flag=True, help='Delete earlier builds first.')
+@with_appcontext
+def build_assets_command(clean):
+    """Write content-hashed, precompressed CSS/JS to static/dist."""
+    # Earlier builds are kept by default: pages cached before a deploy
+    # still link to them
+    if clean:
+        shutil.rmtree(os.path.join(current_app.static_folder, DIST_DIR), ignore_errors=True)
+    manifest = build_assets(current_app.static_folder)
+    for name, hashed in sorted(manifest.items()):
+        click.echo(f"{name} -> {hashed}")
+    if brotli is None:
+        click.echo("brotli not installed; wrote gzip copies only.")
+    click.echo("Restart the app to pick up the new manifest.")
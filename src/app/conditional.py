@@ -0,0 +1,93 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from app import db
+from app.models import ContentGeneration, Design, Post, Comment, Rating
+
+# Row types whose changes can alter a rendered page
+CONTENT_MODELS = (Design, Post, Comment, Rating)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_generation(session, flush_context):
+    # Any flushed content change moves the global generation forward,
+    # in the same transaction as the change itself
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, CONTENT_MODELS):
+            session.connection().execute(
+                update(ContentGeneration)
+                .where(ContentGeneration.id == 1)
+                .values(value=ContentGeneration.value + 1, updated_at=datetime.utcnow())
+            )
+            return
+
+
+def current_generation():
+    # (value, updated_at); a primary-key lookup on a one-row table
+    row = db.session.query(ContentGeneration.value, ContentGeneration.updated_at).filter_by(id=1).first()
+    return row if row else (0, None)
+
+
+def viewer_key():
+    # Pages differ per viewer (edit links, admin controls, own rating)
+    if current_user.is_authenticated:
+        return f"{current_user.id}:{int(bool(current_user.is_admin))}"
+    return 'anon'
+
+
+def generation_validators(**kwargs):
+    value, updated_at = current_generation()
+    return f"gen-{value}", updated_at
+
+
+def design_validators(public_id, **kwargs):
+    # Comment and rating writes bump the design's version too
+    row = db.session.query(Design.id, Design.version, Design.updated_at).filter_by(public_id=public_id).first()
+    if not row:
+        return None, None
+    design_id, version, updated_at = row
+    return f"design-{design_id}-{version}", updated_at
+
+
+def conditional(validators):
+    """Answer conditional GETs with 304 before the view runs.
+
+    validators(**view_kwargs) returns (version_string, last_modified) and
+    should be a cheap indexed lookup. The ETag combines that version with
+    the viewer and the full URL. Requests with pending flash messages are
+    always rendered so the message isn't swallowed by a 304.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+
+            version, last_modified = validators(**kwargs)
+            if version is None:
+                # e.g. the row doesn't exist; let the view produce its 404
+                return f(*args, **kwargs)
+            raw = f"{version}|{viewer_key()}|{request.full_path}"
+            etag = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+            if request.if_none_match.contains(etag) and not session.get('_flashes'):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            # Browsers must revalidate; shared caches must not mix viewers
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
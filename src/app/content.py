@@ -0,0 +1,16 @@
+import re
+
+EXTRA_BLANK_LINES = re.compile(r'(\s*\n){3,}')
+
+
+def normalize_content(text):
+    """Clean up user text once, when it is written.
+
+    Line endings become \\n, and runs of three or more newlines (with any
+    whitespace between them) collapse to one blank line. Templates print
+    the stored value as-is.
+    """
+    if not text:
+        return text
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return EXTRA_BLANK_LINES.sub('\n\n', text)
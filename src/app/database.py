@@ -0,0 +1,233 @@
+import functools
+import random
+import threading
+import time
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from flask import current_app
+from flask_sqlalchemy.session import Session
+
+# SQLite engine profile (SQLITE_PROFILE = 'wal'). Every connection gets
+# the pragmas below. The default engine becomes the writer: a single
+# pooled connection per process whose transactions start with BEGIN
+# IMMEDIATE, so threads queue on the pool instead of failing with
+# "database is locked" when a deferred transaction tries to upgrade. A
+# second engine (bind key 'read') serves SELECTs concurrently, which WAL
+# allows alongside the writer. RoutingSession picks between them.
+
+READ_BIND = 'read'
+
+
+def _is_sqlite_file(url):
+    url = sa.engine.make_url(url)
+    return url.drivername in ('sqlite', 'sqlite+pysqlite') and url.database not in (None, '', ':memory:')
+
+
+def profile_enabled(config):
+    return config.get('SQLITE_PROFILE') == 'wal' and _is_sqlite_file(config['SQLALCHEMY_DATABASE_URI'])
+
+
+def configure_engines(app):
+    """Set engine options from the profile; call before db.init_app()."""
+    config = app.config
+    if not profile_enabled(config):
+        return
+    # Wait on the pool a little longer than SQLite would wait on the lock
+    pool_timeout = config['SQLITE_BUSY_TIMEOUT'] / 1000 + 5
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': 1,
+        'max_overflow': 0,
+        'pool_timeout': pool_timeout,
+        **config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
+    binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+    binds.setdefault(READ_BIND, {
+        'url': config['SQLALCHEMY_DATABASE_URI'],
+        'pool_size': config['SQLITE_READ_POOL_SIZE'],
+        'max_overflow': 0,
+        'pool_timeout': pool_timeout,
+    })
+    config['SQLALCHEMY_BINDS'] = binds
+
+
+# --- Metrics ---
+
+class EngineStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+
+    def incr(self, name, key, amount=1):
+        with self._lock:
+            counters = self.counters.setdefault(name, {})
+            counters[key] = counters.get(key, 0) + amount
+
+    def observe_max(self, name, key, value):
+        with self._lock:
+            counters = self.counters.setdefault(name, {})
+            counters[key] = max(counters.get(key, 0), value)
+
+    def snapshot(self, name):
+        with self._lock:
+            return dict(self.counters.get(name, {}))
+
+
+engine_stats = EngineStats()
+
+
+def _is_lock_error(error):
+    message = str(getattr(error, 'orig', error)).lower()
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def _set_pragmas(config):
+    pragmas = [
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT']),
+        ('mmap_size', config['SQLITE_MMAP_SIZE']),
+        ('cache_size', config['SQLITE_CACHE_SIZE']),
+        ('temp_store', 'MEMORY'),
+    ]
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+    return on_connect
+
+
+def _instrument(engine, name):
+    event.listen(engine, 'connect', lambda *a: engine_stats.incr(name, 'connects'))
+    event.listen(engine.pool, 'checkout', lambda *a: engine_stats.incr(name, 'checkouts'))
+
+
+def _make_writer(engine, config):
+    retries = config['DB_LOCK_RETRIES']
+    backoff = config['DB_LOCK_BACKOFF']
+
+    @event.listens_for(engine, 'connect')
+    def disable_pysqlite_transactions(dbapi_connection, connection_record):
+        # pysqlite would otherwise emit its own deferred BEGIN before DML
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def begin_immediate(conn):
+        # Nothing has run in the transaction yet, so retrying is safe
+        for attempt in range(retries + 1):
+            try:
+                conn.exec_driver_sql('BEGIN IMMEDIATE')
+                break
+            except OperationalError as e:
+                if not _is_lock_error(e) or attempt == retries:
+                    engine_stats.incr('write', 'lock_failures')
+                    raise
+                engine_stats.incr('write', 'lock_retries')
+                time.sleep(backoff * 2 ** attempt * (0.5 + random.random()))
+        conn.info['write_started'] = time.perf_counter()
+
+    def finished(conn):
+        started = conn.info.pop('write_started', None)
+        if started is not None:
+            held = (time.perf_counter() - started) * 1000
+            engine_stats.incr('write', 'transactions')
+            engine_stats.incr('write', 'lock_held_ms_total', held)
+            engine_stats.observe_max('write', 'lock_held_ms_max', held)
+
+    event.listen(engine, 'commit', finished)
+    event.listen(engine, 'rollback', finished)
+
+
+def init_engines(app, db):
+    """Attach pragmas, transaction handling and metrics; call after db.init_app()."""
+    if not profile_enabled(app.config):
+        return
+    with app.app_context():
+        writer = db.engines[None]
+        reader = db.engines[READ_BIND]
+    on_connect = _set_pragmas(app.config)
+    for engine, name in ((writer, 'write'), (reader, READ_BIND)):
+        event.listen(engine, 'connect', on_connect)
+        _instrument(engine, name)
+    _make_writer(writer, app.config)
+
+
+def pool_stats(db):
+    """Pool occupancy and counters for this process's engines."""
+    stats = {'profile': current_app.config.get('SQLITE_PROFILE') if profile_enabled(current_app.config) else None}
+    for key, name in ((None, 'write'), (READ_BIND, READ_BIND)):
+        engine = db.engines.get(key)
+        if engine is None:
+            continue
+        pool = engine.pool
+        entry = {'pool': type(pool).__name__}
+        if isinstance(pool, sa.pool.QueuePool):
+            entry.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+        entry.update(engine_stats.snapshot(name))
+        if 'lock_held_ms_total' in entry:
+            entry['lock_held_ms_total'] = round(entry['lock_held_ms_total'], 1)
+            entry['lock_held_ms_max'] = round(entry['lock_held_ms_max'], 1)
+        stats[name] = entry
+    return stats
+
+
+# --- Read/write routing ---
+
+def _is_read(clause):
+    if isinstance(clause, (sa.Select, sa.CompoundSelect)):
+        return True
+    if isinstance(clause, sa.TextClause):
+        return clause.text.lstrip().upper().startswith(('SELECT', 'WITH'))
+    return False
+
+
+class RoutingSession(Session):
+    """Sends SELECTs to the read engine until the transaction writes.
+
+    From the first flush or DML statement on, everything in the
+    transaction goes to the writer so it reads its own changes; the
+    flag resets when the transaction ends.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            engines = self._db.engines
+            if (READ_BIND in engines and not self._flushing
+                    and not self.info.get('wrote') and _is_read(clause)):
+                return engines[READ_BIND]
+            self.info['wrote'] = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _reset_routing(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('wrote', None)
+
+
+# --- Retrying whole units of work ---
+
+def retry_on_lock(f):
+    """Re-run f after a rollback if SQLite still reports a lock.
+
+    Only for functions that are safe to repeat from the start: they do
+    their own reads and commit. Bounded by DB_LOCK_RETRIES.
+    """
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        from app import db
+        config = current_app.config
+        retries = config.get('DB_LOCK_RETRIES', 3)
+        backoff = config.get('DB_LOCK_BACKOFF', 0.05)
+        for attempt in range(retries + 1):
+            try:
+                return f(*args, **kwargs)
+            except OperationalError as e:
+                db.session.rollback()
+                if not _is_lock_error(e) or attempt == retries:
+                    raise
+                engine_stats.incr('write', 'lock_retries')
+                time.sleep(backoff * 2 ** attempt * (0.5 + random.random()))
+    return wrapper
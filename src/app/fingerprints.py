@@ -0,0 +1,331 @@
+import os
+import threading
+from datetime import datetime
+from sqlalchemy import func, or_
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.models import Design, DesignFingerprint
+from app.images import upload_dir
+
+try:
+    from PIL import Image
+except ImportError:  # fingerprints can't be computed without Pillow
+    Image = None
+
+# Difference hash (dHash) of each design image: 8x8 horizontal and 8x8
+# vertical gradients per RGB channel = 384 bits. Grayscale alone would
+# treat recolours of the same layout as duplicates (for flags the colours
+# are the design), and horizontal gradients alone are all zero for every
+# horizontally striped flag. Re-encodes and resizes of the same image
+# land within a few bits.
+HASH_SIZE = 8
+HASH_BITS = 3 * 2 * HASH_SIZE * HASH_SIZE
+HASH_HEX_DIGITS = HASH_BITS // 4
+DEFAULT_RADIUS = 8
+
+
+def _channel_dhash(channel):
+    value = 0
+    # Left/right neighbours, then (on the transposed image) top/bottom
+    for transpose in (False, True):
+        size = (HASH_SIZE, HASH_SIZE + 1) if transpose else (HASH_SIZE + 1, HASH_SIZE)
+        small = channel.resize(size, Image.LANCZOS)
+        if transpose:
+            small = small.transpose(Image.Transpose.TRANSPOSE)
+        pixels = small.tobytes()
+        for row in range(HASH_SIZE):
+            for col in range(HASH_SIZE):
+                left = pixels[row * (HASH_SIZE + 1) + col]
+                right = pixels[row * (HASH_SIZE + 1) + col + 1]
+                value = (value << 1) | (left > right)
+    return value
+
+
+def dhash(path):
+    """384-bit dHash of an image file as an int, or None if it can't be read."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as img:
+            img.seek(0)  # first frame of animated GIFs
+            img.draft('RGB', (HASH_SIZE * 16, HASH_SIZE * 16))  # JPEGs decode at reduced size
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA')  # palette images would otherwise shrink with NEAREST
+            # Shrink before any full-size copies; the hash only needs 9x9
+            img.thumbnail((HASH_SIZE * 16, HASH_SIZE * 16))
+            img = img.convert('RGBA')
+            # Transparent areas hash as white, as they are shown on the site
+            background = Image.new('RGBA', img.size, (255, 255, 255, 255))
+            img = Image.alpha_composite(background, img).convert('RGB')
+            value = 0
+            for channel in img.split():
+                value = (value << (2 * HASH_SIZE * HASH_SIZE)) | _channel_dhash(channel)
+            return value
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def to_hex(value):
+    return f"{value:0{HASH_HEX_DIGITS}x}"
+
+
+def from_hex(text):
+    return int(text, 16)
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes under Hamming distance.
+
+    A radius-r query only descends into children whose edge distance is
+    within r of the query's distance to the node, which prunes most of
+    the catalog for small radii. Each node holds every item sharing its
+    exact hash; remove() drops items without restructuring the tree.
+    """
+
+    def __init__(self):
+        self._root = None  # [hash, set(items), {distance: child}]
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, value, item):
+        if self._root is None:
+            self._root = [value, {item}, {}]
+            self._size += 1
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                if item not in node[1]:
+                    node[1].add(item)
+                    self._size += 1
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, {item}, {}]
+                self._size += 1
+                return
+            node = child
+
+    def remove(self, value, item):
+        node = self._root
+        while node is not None:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                if item in node[1]:
+                    node[1].discard(item)
+                    self._size -= 1
+                return
+            node = node[2].get(distance)
+
+    def search(self, value, radius):
+        """[(distance, item)] for every item within radius, nearest first."""
+        if self._root is None:
+            return []
+        results = []
+        stack = [self._root]
+        while stack:
+            node_value, items, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= radius:
+                results.extend((distance, item) for item in items)
+            for edge, child in children.items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        results.sort(key=lambda r: (r[0], r[1]))
+        return results
+
+
+class FingerprintIndex:
+    """Per-process BK-tree of the catalog for upload-time duplicate checks.
+
+    Loaded at startup and kept current incrementally: refresh() pulls only
+    rows committed since the last load or refresh (by their seq), so
+    fingerprints written by other gunicorn workers or the job worker show
+    up without a reload.
+    Deleted designs may linger in the tree; callers re-check matches
+    against the database.
+    """
+
+    def __init__(self):
+        self._tree = BKTree()
+        self._hashes = {}  # design_id -> hash
+        self._watermark = None  # highest seq seen
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _apply(self, design_id, value):
+        old = self._hashes.get(design_id)
+        if old == value:
+            return
+        if old is not None:
+            self._tree.remove(old, design_id)
+        self._tree.add(value, design_id)
+        self._hashes[design_id] = value
+
+    def refresh(self):
+        query = db.session.query(DesignFingerprint.design_id, DesignFingerprint.dhash, DesignFingerprint.seq)
+        with self._lock:
+            if self._loaded and self._watermark is not None:
+                query = query.filter(DesignFingerprint.seq > self._watermark)
+            for design_id, value, seq in query:
+                self._apply(design_id, from_hex(value))
+                if self._watermark is None or seq > self._watermark:
+                    self._watermark = seq
+            self._loaded = True
+
+    def add(self, design_id, value):
+        with self._lock:
+            self._apply(design_id, value)
+
+    def remove(self, design_id):
+        with self._lock:
+            value = self._hashes.pop(design_id, None)
+            if value is not None:
+                self._tree.remove(value, design_id)
+
+    def nearest(self, value, radius=DEFAULT_RADIUS):
+        """[(distance, design_id)] within radius, after pulling in new rows."""
+        self.refresh()
+        with self._lock:
+            return self._tree.search(value, radius)
+
+    def __len__(self):
+        return len(self._tree)
+
+
+fingerprint_index = FingerprintIndex()
+
+
+def init_fingerprint_index(app):
+    with app.app_context():
+        try:
+            fingerprint_index.refresh()
+        except SQLAlchemyError:
+            # e.g. `flask db upgrade` before the table exists; nearest() loads it later
+            db.session.rollback()
+
+
+def store_fingerprint(design, value):
+    """Save an already computed hash for the design; no commit."""
+    row = db.session.get(DesignFingerprint, design.id)
+    if row is None:
+        row = DesignFingerprint(design_id=design.id)
+        db.session.add(row)
+    row.dhash = to_hex(value)
+    row.image_filename = design.image_filename
+    row.computed_at = datetime.utcnow()
+    # Numbered by the INSERT/UPDATE itself, one past the highest: SQLite
+    # holds the write lock from that statement to the commit, so seq
+    # follows commit order even when the hash was computed long before
+    row.seq = db.session.query(func.coalesce(func.max(DesignFingerprint.seq), 0) + 1).scalar_subquery()
+    fingerprint_index.add(design.id, value)
+
+
+def fingerprint_design(design):
+    """Compute and store the design's fingerprint; no commit. Returns the hash or None."""
+    value = dhash(os.path.join(upload_dir(), design.image_filename)) if design.image_filename else None
+    if value is None:
+        clear_fingerprint(design)
+        return None
+    store_fingerprint(design, value)
+    return value
+
+
+def clear_fingerprint(design):
+    # Call before deleting a design: drops its hash and any duplicate flags pointing at it
+    DesignFingerprint.query.filter_by(design_id=design.id).delete()
+    Design.query.filter_by(duplicate_of_id=design.id).update({'duplicate_of_id': None}, synchronize_session=False)
+    fingerprint_index.remove(design.id)
+
+
+def find_duplicates(path, radius=DEFAULT_RADIUS):
+    """Hash an image file and look it up in the catalog.
+
+    Returns (hash, [(distance, Design)]) nearest first; approved designs
+    only. hash is None if the image can't be read.
+    """
+    value = dhash(path)
+    if value is None:
+        return None, []
+    matches = fingerprint_index.nearest(value, radius)
+    if not matches:
+        return value, []
+    designs = {d.id: d for d in Design.query.filter(
+        Design.id.in_([design_id for _, design_id in matches]), Design.approved == True)}
+    return value, [(distance, designs[design_id]) for distance, design_id in matches if design_id in designs]
+
+
+def backfill_fingerprints(force=False):
+    """Fingerprint designs that have none, or whose image changed since.
+
+    Returns (computed, unreadable).
+    """
+    current = {row.design_id: row.image_filename for row in DesignFingerprint.query}
+    computed = unreadable = 0
+    for design in Design.query.filter(Design.image_filename.isnot(None)):
+        if not force and current.get(design.id) == design.image_filename:
+            continue
+        if fingerprint_design(design) is None:
+            unreadable += 1
+        else:
+            computed += 1
+    return computed, unreadable
+
+
+def stale_fingerprint_ids():
+    # Designs with an image but no hash of that image: never fingerprinted
+    # (e.g. from before the fingerprint table), or the image was replaced since
+    rows = db.session.query(Design.id).outerjoin(
+        DesignFingerprint, DesignFingerprint.design_id == Design.id
+    ).filter(
+        Design.image_filename.isnot(None),
+        or_(DesignFingerprint.design_id.is_(None), DesignFingerprint.image_filename != Design.image_filename)
+    )
+    return [design_id for (design_id,) in rows]
+
+
+def load_tree():
+    # BK-tree of every stored fingerprint, items are design ids
+    tree = BKTree()
+    for design_id, value in db.session.query(DesignFingerprint.design_id, DesignFingerprint.dhash):
+        tree.add(from_hex(value), design_id)
+    return tree
+
+
+def duplicate_clusters(radius=DEFAULT_RADIUS, tree=None):
+    """Group designs whose images are within radius bits of each other.
+
+    Returns a list of clusters, each a sorted list of design ids, largest
+    cluster first. Clusters are transitive (single-linkage).
+    """
+    if tree is None:
+        tree = load_tree()
+    hashes = {design_id: from_hex(value) for design_id, value in
+              db.session.query(DesignFingerprint.design_id, DesignFingerprint.dhash)}
+
+    parent = {design_id: design_id for design_id in hashes}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for design_id, value in hashes.items():
+        for distance, other in tree.search(value, radius):
+            if other != design_id and other in parent:
+                parent[find(other)] = find(design_id)
+
+    groups = {}
+    for design_id in hashes:
+        groups.setdefault(find(design_id), []).append(design_id)
+    clusters = [sorted(ids) for ids in groups.values() if len(ids) > 1]
+    clusters.sort(key=lambda ids: (-len(ids), ids[0]))
+    return clusters
@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+from flask import current_app, render_template
+from markupsafe import Markup
+
+
+class FragmentCache:
+    """Per-process LRU of rendered card HTML.
+
+    Entries are keyed by (kind, id) and tagged with the row's version
+    column. A write bumps the version, so every gunicorn worker sees the
+    stale entry as a miss on its next lookup. The worker that handled the
+    write also drops its copy right away via invalidate().
+    """
+
+    def __init__(self, max_entries=2000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def set(self, key, version, html):
+        with self._lock:
+            self._entries[key] = (version, html)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, kind, id):
+        with self._lock:
+            self._entries.pop((kind, id), None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None
+            }
+
+
+fragment_cache = FragmentCache()
+
+
+def init_fragment_cache(app):
+    fragment_cache.max_entries = app.config.get('FRAGMENT_CACHE_SIZE', 2000)
+    app.add_template_global(design_card)
+    app.add_template_global(post_card_body)
+
+
+def _cached(kind, obj, template, **context):
+    if not current_app.config.get('FRAGMENT_CACHE_ENABLED', True):
+        return Markup(render_template(template, **context))
+    key = (kind, obj.id)
+    html = fragment_cache.get(key, obj.version)
+    if html is None:
+        html = Markup(render_template(template, **context))
+        fragment_cache.set(key, obj.version, html)
+    return html
+
+
+def design_card(design):
+    return _cached('design', design, '_design_card.html', design=design)
+
+
+def post_card_body(post):
+    # Only the user-independent part of a discussion post; edit/delete links stay live
+    return _cached('post', post, '_discuss_post_body.html', post=post)
+
+
+def bump_version(obj):
+    # Call from any handler that changes what a card shows
+    obj.version = (obj.version or 0) + 1
+    invalidate(obj)
+
+
+def invalidate(obj):
+    kind = 'design' if obj.__tablename__ == 'design' else 'post'
+    fragment_cache.invalidate(kind, obj.id)
@@ -0,0 +1,117 @@
+from collections import Counter
+from app import db
+from app.models import Design, HashtagCount, Tag, DesignTag
+
+
+def parse_hashtags(text):
+    # Same normalisation the hashtag pages have always used
+    if not text:
+        return []
+    return text.lower().split()
+
+
+def update_hashtag_counts(old_hashtags=None, new_hashtags=None):
+    """Apply the difference between two hashtag strings to the count table.
+
+    Pass old_hashtags=None for a new design and new_hashtags=None for a
+    removed one. Nothing is committed; the caller's commit covers it.
+    """
+    delta = Counter(parse_hashtags(new_hashtags))
+    delta.subtract(parse_hashtags(old_hashtags))
+
+    for tag, change in delta.items():
+        if change == 0:
+            continue
+        # Relative UPDATE so concurrent writers don't overwrite each other
+        updated = HashtagCount.query.filter_by(tag=tag).update(
+            {HashtagCount.count: HashtagCount.count + change},
+            synchronize_session=False
+        )
+        if not updated and change > 0:
+            db.session.add(HashtagCount(tag=tag, count=change))
+
+    if delta:
+        db.session.flush()
+        HashtagCount.query.filter(HashtagCount.count <= 0).delete(synchronize_session=False)
+
+
+def get_or_create_tags(names):
+    # Map of name -> Tag for the given (already normalised) names
+    names = set(names)
+    if not names:
+        return {}
+    tags = {t.name: t for t in Tag.query.filter(Tag.name.in_(names))}
+    for name in names - tags.keys():
+        tag = Tag(name=name)
+        db.session.add(tag)
+        tags[name] = tag
+    db.session.flush()
+    return tags
+
+
+def sync_design_tags(design):
+    """Make the design's DesignTag rows match its hashtags string.
+
+    The design must already have an id (add + flush first).
+    """
+    wanted = get_or_create_tags(parse_hashtags(design.hashtags))
+    wanted_ids = {t.id for t in wanted.values()}
+    current_ids = {tag_id for (tag_id,) in db.session.query(DesignTag.tag_id).filter_by(design_id=design.id)}
+
+    stale = current_ids - wanted_ids
+    if stale:
+        DesignTag.query.filter(
+            DesignTag.design_id == design.id, DesignTag.tag_id.in_(stale)
+        ).delete(synchronize_session=False)
+    for tag_id in wanted_ids - current_ids:
+        db.session.add(DesignTag(design_id=design.id, tag_id=tag_id))
+
+
+def clear_design_tags(design):
+    DesignTag.query.filter_by(design_id=design.id).delete(synchronize_session=False)
+
+
+def rebuild_design_tags():
+    # Re-derive every DesignTag row from Design.hashtags
+    DesignTag.query.delete()
+    rows = db.session.query(Design.id, Design.hashtags).all()
+    tags = get_or_create_tags(t for _, hashtags in rows for t in parse_hashtags(hashtags))
+    for design_id, hashtags in rows:
+        for name in set(parse_hashtags(hashtags)):
+            db.session.add(DesignTag(design_id=design_id, tag_id=tags[name].id))
+    db.session.commit()
+    return len(tags)
+
+
+def design_ids_with_tag(name):
+    # Subquery of design ids carrying exactly this tag (uses ix_design_tag_tag_id_design_id)
+    return db.session.query(DesignTag.design_id).join(Tag, Tag.id == DesignTag.tag_id).filter(
+        Tag.name == name.lower()
+    )
+
+
+def rebuild_hashtag_counts():
+    # Full recount from approved designs, for backfills and repairs
+    tag_counts = Counter()
+    for (hashtags,) in db.session.query(Design.hashtags).filter(Design.approved == True):
+        tag_counts.update(parse_hashtags(hashtags))
+
+    HashtagCount.query.delete()
+    for tag, count in tag_counts.items():
+        db.session.add(HashtagCount(tag=tag, count=count))
+    db.session.commit()
+    return len(tag_counts)
+
+
+def top_hashtags(limit=None):
+    # (tag, count) pairs sorted by count desc, then alphabetically
+    query = db.session.query(HashtagCount.tag, HashtagCount.count).order_by(
+        HashtagCount.count.desc(), HashtagCount.tag
+    )
+    if limit:
+        query = query.limit(limit)
+    return [(tag, count) for tag, count in query]
+
+
+def all_hashtag_names():
+    return [tag for (tag,) in db.session.query(HashtagCount.tag).order_by(HashtagCount.tag)]
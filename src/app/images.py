@@ -0,0 +1,114 @@
+import os
+from flask import current_app, url_for
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow missing: templates fall back to the original upload
+    Image = None
+
+# Resized copies of every upload, stored next to it under uploads/variants/.
+# Each variant is written as WebP plus a JPEG (or PNG when the image has
+# transparency) for browsers without WebP.
+VARIANTS = {
+    'thumb': 480,    # grid cards
+    'detail': 1280,  # design detail page
+}
+VARIANT_DIR = 'variants'
+
+
+def upload_dir():
+    return os.path.join(current_app.root_path, 'static', 'uploads')
+
+
+def _has_alpha(img):
+    # Many flag PNGs carry an alpha channel that is fully opaque; those can go to JPEG
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        return img.convert('RGBA').getchannel('A').getextrema()[0] < 255
+    return False
+
+
+def _variant_name(filename, variant, ext):
+    stem = os.path.splitext(filename)[0]
+    return f"{VARIANT_DIR}/{stem}_{variant}.{ext}"
+
+
+def _fallback_ext(filename):
+    # PNG only when the image has transparency, see generate_variants()
+    if os.path.exists(os.path.join(upload_dir(), _variant_name(filename, 'thumb', 'png'))):
+        return 'png'
+    return 'jpg'
+
+
+def generate_variants(filename, force=False):
+    """Write the resized variants for an upload. Returns True on success.
+
+    Images are only ever scaled down; a variant wider than the original
+    is just a re-encode at the original size.
+    """
+    if Image is None or not filename:
+        return False
+    source = os.path.join(upload_dir(), filename)
+    if not os.path.exists(source):
+        return False
+    os.makedirs(os.path.join(upload_dir(), VARIANT_DIR), exist_ok=True)
+
+    try:
+        with Image.open(source) as img:
+            img = ImageOps.exif_transpose(img)
+            alpha = _has_alpha(img)
+            img = img.convert('RGBA' if alpha else 'RGB')
+            fallback = 'png' if alpha else 'jpg'
+
+            for variant, width in VARIANTS.items():
+                webp_path = os.path.join(upload_dir(), _variant_name(filename, variant, 'webp'))
+                fallback_path = os.path.join(upload_dir(), _variant_name(filename, variant, fallback))
+                if not force and os.path.exists(webp_path) and os.path.exists(fallback_path):
+                    continue
+
+                resized = img.copy()
+                resized.thumbnail((width, width * 4), Image.LANCZOS)
+                resized.save(webp_path, 'WEBP', quality=80, method=4)
+                if fallback == 'png':
+                    resized.save(fallback_path, 'PNG', optimize=True)
+                else:
+                    resized.save(fallback_path, 'JPEG', quality=82, optimize=True, progressive=True)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        current_app.logger.warning(f"Could not build variants for {filename}: {e}")
+        return False
+    return True
+
+
+def remove_variants(filename):
+    if not filename:
+        return
+    stem = os.path.join(upload_dir(), VARIANT_DIR, os.path.splitext(filename)[0])
+    for variant in VARIANTS:
+        for ext in ('webp', 'jpg', 'png'):
+            path = f"{stem}_{variant}.{ext}"
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def image_variants(filename):
+    """URLs for an upload's variants, or None if they haven't been built.
+
+    {'original': url, 'webp_srcset': '... 480w, ... 1280w',
+     'srcset': same in the fallback format, 'thumb': fallback thumb url}
+    """
+    if not filename:
+        return None
+    if not os.path.exists(os.path.join(upload_dir(), _variant_name(filename, 'thumb', 'webp'))):
+        return None
+
+    fallback = _fallback_ext(filename)
+    webp = []
+    plain = []
+    for variant, width in VARIANTS.items():
+        webp.append(f"{url_for('static', filename='uploads/' + _variant_name(filename, variant, 'webp'))} {width}w")
+        plain.append(f"{url_for('static', filename='uploads/' + _variant_name(filename, variant, fallback))} {width}w")
+    return {
+        'original': url_for('static', filename='uploads/' + filename),
+        'thumb': url_for('static', filename='uploads/' + _variant_name(filename, 'thumb', fallback)),
+        'webp_srcset': ', '.join(webp),
+        'srcset': ', '.join(plain),
+    }
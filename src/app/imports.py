@@ -0,0 +1,85 @@
+import os
+from datetime import datetime
+from app import db
+from app.models import ImportRecord, Post, Design
+from app.uploads import hash_file
+
+MODELS = {'Post': Post, 'Design': Design}
+
+
+class ImportManifest:
+    """Which Takeout files have been imported, and into which row.
+
+    Loaded once per run. A file whose size and mtime match its record is
+    unchanged (one stat and a dict lookup); if they differ the SHA-256
+    decides, so a file that was only touched is still skipped. Records
+    are written in the caller's transaction together with the rows they
+    point at, so a run that dies halfway resumes after its last commit.
+
+    Paths are stored relative to the archive root so the Takeout can be
+    moved between machines.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.records = {r.path: r for r in ImportRecord.query}
+        self._with_image = None
+
+    def key(self, fpath):
+        return os.path.relpath(fpath, self.root)
+
+    def get(self, fpath):
+        return self.records.get(self.key(fpath))
+
+    def status(self, fpath, sha256=None):
+        """'new', 'changed' or 'unchanged'."""
+        record = self.get(fpath)
+        if record is None:
+            return 'new'
+        st = os.stat(fpath)
+        if record.size == st.st_size and record.mtime == st.st_mtime:
+            return 'unchanged'
+        if (sha256 or hash_file(fpath)) == record.sha256:
+            # Same bytes, new mtime (copied or touched); no commit, the caller's covers it
+            record.size, record.mtime = st.st_size, st.st_mtime
+            return 'unchanged'
+        return 'changed'
+
+    def target(self, record):
+        # The Post/Design a record points at, or None if there is none (any more)
+        if record is None or record.target_type not in MODELS:
+            return None
+        return db.session.get(MODELS[record.target_type], record.target_id)
+
+    def has_image(self, record):
+        """True if the record's row still exists and has an image.
+
+        Checked against sets loaded on first use, not per file.
+        """
+        if self._with_image is None:
+            self._with_image = set()
+            for name, model in MODELS.items():
+                self._with_image.update((name, row_id) for (row_id,) in
+                                        db.session.query(model.id).filter(model.image_filename.isnot(None)))
+        return record is not None and (record.target_type, record.target_id) in self._with_image
+
+    def record(self, fpath, target=None, sha256=None):
+        """Create or update the record for fpath; no commit.
+
+        target is the Post/Design the file produced (flushed, so it has an
+        id), or None if the file was deliberately not imported.
+        """
+        key = self.key(fpath)
+        record = self.records.get(key)
+        if record is None:
+            record = ImportRecord(path=key)
+            db.session.add(record)
+            self.records[key] = record
+        st = os.stat(fpath)
+        record.size = st.st_size
+        record.mtime = st.st_mtime
+        record.sha256 = sha256 or hash_file(fpath)
+        record.target_type = type(target).__name__ if target is not None else None
+        record.target_id = target.id if target is not None else None
+        record.imported_at = datetime.utcnow()
+        return record
@@ -0,0 +1,256 @@
+import json
+import os
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from app import db
+from app.models import Job, Design, Post
+from app.images import generate_variants
+from app.fragments import bump_version
+from app.search import index_design, index_post
+from app.fingerprints import fingerprint_design, stale_fingerprint_ids
+from app.database import retry_on_lock
+
+# kind -> callable(**payload). Handlers run inside the worker's session and
+# must not commit; the worker commits (or rolls back) around each job.
+HANDLERS = {}
+
+
+def handler(kind):
+    def decorator(f):
+        HANDLERS[kind] = f
+        return f
+    return decorator
+
+
+def enqueue(kind, **payload):
+    """Queue a job in the caller's transaction; it becomes visible on commit.
+
+    With JOBS_INLINE set (development, tests, no worker running) the
+    handler runs right away instead.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    if current_app.config.get('JOBS_INLINE'):
+        try:
+            HANDLERS[kind](**payload)
+        except Exception as e:
+            current_app.logger.warning(f"Inline job {kind} failed: {e}")
+        return None
+    job = Job(kind=kind, payload=json.dumps(payload),
+              max_attempts=current_app.config.get('JOB_MAX_ATTEMPTS', 5))
+    db.session.add(job)
+    return job
+
+
+def enqueue_image_jobs(rows):
+    """Queue what submit() queues for a new image, for rows given one elsewhere.
+
+    Variants for each distinct image and a fingerprint for each design,
+    so archive imports and restores are served resized and join the
+    duplicate index. Rows must be flushed (have ids); runs in the
+    caller's transaction like enqueue().
+    """
+    for filename in sorted({row.image_filename for row in rows if row.image_filename}):
+        enqueue('image_variants', filename=filename)
+    for row in rows:
+        if isinstance(row, Design) and row.image_filename:
+            enqueue('fingerprint_design', design_id=row.id)
+
+
+def backoff(attempts):
+    # 10s, 20s, 40s, ... capped at an hour
+    return timedelta(seconds=min(10 * 2 ** (attempts - 1), 3600))
+
+
+@retry_on_lock
+def claim_next(worker_id):
+    """Mark the oldest runnable job as running and return it, or None.
+
+    SQLite has no SKIP LOCKED, so the claim is a conditional UPDATE; if
+    another worker got there first the rowcount is 0 and we try again.
+    """
+    while True:
+        now = datetime.utcnow()
+        candidate = db.session.query(Job.id).filter(
+            Job.status == 'queued', Job.run_after <= now
+        ).order_by(Job.run_after, Job.id).first()
+        if candidate is None:
+            db.session.rollback()
+            return None
+
+        claimed = Job.query.filter_by(id=candidate.id, status='queued').update({
+            'status': 'running',
+            'locked_by': worker_id,
+            'locked_at': now,
+            'attempts': Job.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, candidate.id)
+
+
+def run_job(job):
+    job_id = job.id
+    try:
+        job_handler = HANDLERS.get(job.kind)
+        if job_handler is None:
+            raise ValueError(f"No handler for job kind {job.kind}")
+        job_handler(**json.loads(job.payload))
+        job.status = 'done'
+        job.last_error = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return True
+    except Exception:
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.last_error = traceback.format_exc(limit=5)[-2000:]
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = 'queued'
+            job.run_after = datetime.utcnow() + backoff(job.attempts)
+        job.locked_by = None
+        db.session.commit()
+        current_app.logger.warning(f"Job {job_id} ({job.kind}) attempt {job.attempts} failed")
+        return False
+
+
+@retry_on_lock
+def requeue_stale(timeout):
+    # Jobs left 'running' by a worker that died or was killed mid-job
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout)
+    count = Job.query.filter(Job.status == 'running', Job.locked_at < cutoff).update(
+        {'status': 'queued', 'locked_by': None}, synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+@retry_on_lock
+def enqueue_missing_fingerprints():
+    """Queue fingerprint jobs for designs without a current hash.
+
+    Run when the worker starts, so designs from before the fingerprint
+    table or rows written outside the upload path are filled in without a
+    manual `flask dedupe-images`. Returns how many were queued.
+    """
+    pending = {json.loads(payload).get('design_id') for (payload,) in db.session.query(Job.payload).filter(
+        Job.kind == 'fingerprint_design', Job.status.in_(('queued', 'running')))}
+    design_ids = [design_id for design_id in stale_fingerprint_ids() if design_id not in pending]
+    for design_id in design_ids:
+        enqueue('fingerprint_design', design_id=design_id)
+    db.session.commit()
+    return len(design_ids)
+
+
+def prune_finished(days):
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    count = Job.query.filter(Job.status == 'done', Job.finished_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def retry_failed():
+    count = Job.query.filter_by(status='failed').update(
+        {'status': 'queued', 'attempts': 0, 'run_after': datetime.utcnow(), 'finished_at': None},
+        synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def _last_line(text):
+    lines = (text or '').strip().splitlines()
+    return lines[-1] if lines else None
+
+
+def queue_stats():
+    counts = dict(db.session.query(Job.status, func.count(Job.id)).group_by(Job.status).all())
+    oldest = db.session.query(func.min(Job.created_at)).filter(Job.status == 'queued').scalar()
+    failures = Job.query.filter_by(status='failed').order_by(Job.finished_at.desc()).limit(10).all()
+    oldest_seconds = int((datetime.utcnow() - oldest).total_seconds()) if oldest else None
+    # Jobs waiting out a retry backoff aren't overdue until their run_after
+    overdue = db.session.query(func.min(Job.run_after)).filter(Job.status == 'queued').scalar()
+    overdue_seconds = (datetime.utcnow() - overdue).total_seconds() if overdue else 0
+    return {
+        'queued': counts.get('queued', 0),
+        'running': counts.get('running', 0),
+        'done': counts.get('done', 0),
+        'failed': counts.get('failed', 0),
+        'oldest_queued_seconds': oldest_seconds,
+        # Nothing picked up the queue for a while: the worker is down or stuck
+        'stalled': overdue_seconds > current_app.config.get('JOB_STALL_AFTER', 300),
+        'recent_failures': [{
+            'id': j.id,
+            'kind': j.kind,
+            'payload': json.loads(j.payload),
+            'attempts': j.attempts,
+            'error': _last_line(j.last_error)
+        } for j in failures]
+    }
+
+
+def run_worker(poll_interval=1.0, burst=False):
+    """Process jobs until stopped, or until the queue is empty with burst=True."""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    config = current_app.config
+    requeue_stale(config.get('JOB_TIMEOUT', 600))
+    last_maintenance = time.monotonic()
+    current_app.logger.info(f"Job worker {worker_id} started")
+    queued = enqueue_missing_fingerprints()
+    if queued:
+        current_app.logger.info(f"Queued fingerprints for {queued} designs")
+
+    while True:
+        job = claim_next(worker_id)
+        if job is not None:
+            run_job(job)
+            continue
+        if burst:
+            return
+
+        # Hourly housekeeping while idle
+        if time.monotonic() - last_maintenance > 3600:
+            requeue_stale(config.get('JOB_TIMEOUT', 600))
+            prune_finished(config.get('JOB_RETENTION_DAYS', 7))
+            last_maintenance = time.monotonic()
+        time.sleep(poll_interval)
+
+
+# --- Handlers ---
+
+@handler('image_variants')
+def build_image_variants(filename):
+    if not generate_variants(filename):
+        # Missing file or Pillow: retrying won't help
+        current_app.logger.warning(f"No variants built for {filename}")
+        return
+    # Cards rendered before the variants existed point at the original
+    for model in (Design, Post):
+        for obj in model.query.filter_by(image_filename=filename):
+            bump_version(obj)
+
+
+@handler('index_design')
+def index_design_job(design_id):
+    design = db.session.get(Design, design_id)
+    if design:  # deleted since; unindexed at delete time
+        index_design(design)
+
+
+@handler('index_post')
+def index_post_job(post_id):
+    post = db.session.get(Post, post_id)
+    if post:
+        index_post(post)
+
+
+@handler('fingerprint_design')
+def fingerprint_design_job(design_id):
+    design = db.session.get(Design, design_id)
+    if design:
+        fingerprint_design(design)
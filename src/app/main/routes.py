@@ -1,119 +1,181 @@
 import os
 import uuid
-import re
-from collections import Counter
-from flask import render_template, request, redirect, url_for, flash, current_app, jsonify
+from flask import render_template, request, redirect, url_for, flash, current_app, jsonify, Response, stream_template
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
 from app import db
 from app.main import bp
 from app.models import Design, Comment, Rating, Post, User
-from app.models import Design, Comment, Rating, Post, User
+from app.hashtags import (update_hashtag_counts, sync_design_tags, clear_design_tags,
+                          design_ids_with_tag, top_hashtags, all_hashtag_names)
+from app.ratings import set_rating
+from app.content import normalize_content
+from app.fragments import fragment_cache, bump_version, invalidate
+from app.users import user_cache
+from app.database import pool_stats
+from app.uploads import save_upload, ingest_upload, store_upload, release_upload, format_size, UploadRejected
+from app.jobs import enqueue, queue_stats
+from app.fingerprints import clear_fingerprint, find_duplicates, store_fingerprint
+from app.images import upload_dir
+from app.pagination import keyset_paginate, InvalidCursor
+from app.query_budget import query_budget
+from app.conditional import conditional, generation_validators, design_validators
+from app.search import (search_enabled, search_ids, design_search_filter, index_design, index_post,
+                        unindex_design, unindex_post, DESIGN, POST)
 from flask import abort
 from flask import abort
 from sqlalchemy import or_, func
+from sqlalchemy.orm import joinedload, selectinload
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
-@bp.app_template_filter('format_content')
-def format_content(text):
-    if not text:
-        return ""
-    # Normalize line endings
-    text = text.replace('\r\n', '\n').replace('\r', '\n')
-    # Limit consecutive newlines to 2 (stripping 3rd+)
-    # Matches 3 or more occurrences of (newline + optional whitespace)
-    text = re.sub(r'(\s*\n){3,}', '\n\n', text)
-    return text
+@bp.app_errorhandler(413)
+def upload_too_large(e):
+    # MAX_CONTENT_LENGTH tripped: the body was refused before it was read
+    flash(f"Upload is too large (limit {format_size(current_app.config['UPLOAD_MAX_BYTES'])}).", 'error')
+    return redirect(request.url)
 
-@bp.route('/')
-def index():
-    q = request.args.get('q')
-    sort_by = request.args.get('sort', 'newest')
-    rating_filter = request.args.get('rating')
+def design_feed_query(args):
+    # Gallery filters from the query string (for the page and its ajax
+    # scroll pages), plus the keyset sort columns for the requested order.
+    q = args.get('q')
+    tag = args.get('tag')
+    sort_by = args.get('sort', 'newest')
+    rating_filter = args.get('rating')
     
     query = Design.query.filter_by(approved=True)
     
     if q:
-        search_term = f"%{q}%"
-        query = query.filter(or_(
-            Design.title.ilike(search_term),
-            Design.description.ilike(search_term),
-            Design.hashtags.ilike(search_term)
-        ))
-        
-    # Join if we need to sort by rating OR filter by rating
-    if sort_by == 'top' or rating_filter:
-        query = query.outerjoin(Design.ratings).group_by(Design.id)
+        if search_enabled():
+            query = query.filter(design_search_filter(q))
+        else:
+            search_term = f"%{q}%"
+            query = query.filter(or_(
+                Design.title.ilike(search_term),
+                Design.description.ilike(search_term),
+                Design.hashtags.ilike(search_term)
+            ))
+    
+    if tag:
+        # Exact match through the indexed design_tag table
+        query = query.filter(Design.id.in_(design_ids_with_tag(tag)))
         
+    # Rating filters and sort use the denormalized columns on Design
     if rating_filter:
         if rating_filter == 'unrated':
-            query = query.having(func.count(Rating.id) == 0)
+            query = query.filter(Design.rating_count == 0)
         else:
             try:
                 r_val = int(rating_filter)
-                query = query.having(func.round(func.avg(Rating.value)) == r_val)
+                query = query.filter(Design.rating_bucket == r_val)
             except ValueError:
                 pass
 
     if sort_by == 'top':
-        query = query.order_by(func.avg(Rating.value).desc())
+        sort_columns = [Design.rating_avg, Design.id]
     else:
         # Default newest
-        query = query.order_by(Design.created_at.desc())
-        
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-    designs = pagination.items
+        sort_columns = [Design.created_at, Design.id]
+    
+    return query, sort_columns
+
+def buffered_stream(chunks, size=8192):
+    # Jinja yields many tiny strings; group them so each write is a useful size
+    buffer = []
+    length = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer)
+
+def get_comment_counts(posts):
+    # One grouped COUNT instead of loading every post's comments
+    post_ids = [p.id for p in posts]
+    if not post_ids:
+        return {}
+    rows = db.session.query(Comment.post_id, func.count(Comment.id)).filter(
+        Comment.post_id.in_(post_ids)
+    ).group_by(Comment.post_id)
+    return dict(rows)
+
+@bp.route('/')
+@query_budget(6)
+@conditional(generation_validators)
+def index():
+    query, sort_columns = design_feed_query(request.args)
+    query = query.options(joinedload(Design.author))
+        
+    # Keyset pagination: the cursor holds the sort key of the last card served
+    try:
+        page = keyset_paginate(query, sort_columns, cursor=request.args.get('cursor'), per_page=20)
+    except InvalidCursor:
+        abort(400)
+    designs = page.items
 
     if request.args.get('ajax'):
-        return render_template('partials_design_list.html', designs=designs)
-    
-    # Calculate top hashtags from all approved designs (cache this in production!)
-    all_designs = Design.query.filter_by(approved=True).all()
-    tag_counts = Counter()
-    for d in all_designs:
-        if d.hashtags:
-            tags = d.hashtags.lower().split()
-            tag_counts.update(tags)
-            
-    top_tags = tag_counts.most_common(5)
+        return jsonify({
+            'html': render_template('partials_design_list.html', designs=designs),
+            'next_cursor': page.next_cursor,
+            'has_next': page.has_next
+        })
+    
+    # Top hashtags come from the materialized count table
+    top_tags = top_hashtags(5)
     
-    return render_template('index.html', designs=designs, search_query=q, top_tags=top_tags, sort_by=sort_by, rating_filter=rating_filter, pagination=pagination)
+    return render_template('index.html', designs=designs, search_query=request.args.get('q'),
+                           tag_filter=request.args.get('tag'), top_tags=top_tags,
+                           sort_by=request.args.get('sort', 'newest'),
+                           rating_filter=request.args.get('rating'), page=page)
 
 @bp.route('/hashtags')
+@conditional(generation_validators)
 def hashtags():
-    # Calculate all hashtags from all approved designs
-    all_designs = Design.query.filter_by(approved=True).all()
-    tag_counts = Counter()
-    for d in all_designs:
-        if d.hashtags:
-            # Split and clean tags
-            tags = d.hashtags.lower().split()
-            tag_counts.update(tags)
-            
-    # Sort by count desc, then alphabetical
-    # most_common() returns list of (elem, count) sorted by count.
-    # We might want secondary sort by name if counts are equal, but most_common is stable.
-    all_tags = tag_counts.most_common()
+    # Sorted by count desc, then alphabetical
+    all_tags = top_hashtags()
     
     return render_template('hashtags.html', all_tags=all_tags)
 
 @bp.route('/api/hashtags')
+@conditional(generation_validators)
 def api_hashtags():
-    # Helper to clean tags
-    def get_tags():
-        all_designs = Design.query.filter_by(approved=True).all()
-        unique_tags = set()
-        for d in all_designs:
-            if d.hashtags:
-                tags = d.hashtags.lower().split()
-                unique_tags.update(tags)
-        return sorted(list(unique_tags))
-        
-    return jsonify(get_tags())
+    return jsonify(all_hashtag_names())
+
+@bp.route('/search')
+@query_budget(7)
+@conditional(generation_validators)
+def search():
+    q = (request.args.get('q') or '').strip()
+    designs = []
+    posts = []
+    
+    if q:
+        if search_enabled():
+            # Ranked ids from the FTS index, then load rows and keep the rank order
+            design_ids = search_ids(q, DESIGN, limit=60)
+            post_ids = search_ids(q, POST, limit=30)
+            by_id = {d.id: d for d in Design.query.options(joinedload(Design.author)).filter(
+                Design.id.in_(design_ids), Design.approved == True)}
+            designs = [by_id[i] for i in design_ids if i in by_id]
+            by_id = {p.id: p for p in Post.query.filter(Post.id.in_(post_ids))}
+            posts = [by_id[i] for i in post_ids if i in by_id]
+        else:
+            search_term = f"%{q}%"
+            designs = Design.query.options(joinedload(Design.author)).filter_by(approved=True).filter(or_(
+                Design.title.ilike(search_term),
+                Design.description.ilike(search_term),
+                Design.hashtags.ilike(search_term)
+            )).order_by(Design.created_at.desc()).limit(60).all()
+            posts = Post.query.filter(or_(
+                Post.title.ilike(search_term),
+                Post.content.ilike(search_term)
+            )).order_by(Post.created_at.desc()).limit(30).all()
+    
+    return render_template('search.html', search_query=q, designs=designs, posts=posts)
 
 @bp.route('/submit', methods=['GET', 'POST'])
 @login_required
@@ -125,21 +187,28 @@ def submit():
         
         file = request.files['image']
         title = request.form.get('title')
-        desc = request.form.get('description')
+        desc = normalize_content(request.form.get('description'))
         
         if file.filename == '':
             flash('No selected file', 'error')
             return redirect(request.url)
             
         if file and allowed_file(file.filename):
-            # Create unique filename to prevent overwrites
-            filename = secure_filename(file.filename)
-            unique_filename = f"{uuid.uuid4().hex}_{filename}"
+            # Stored under its content hash; identical images share one file
+            try:
+                ingested = ingest_upload(file)
+            except UploadRejected as e:
+                flash(str(e), 'error')
+                return redirect(request.url)
             
-            save_path = os.path.join(current_app.root_path, 'static/uploads', unique_filename)
-            file.save(save_path)
+            # Near-identical flag already posted? In-memory index, no table scan.
+            # Hashed from the temp file, before store_upload() takes the write lock
+            fingerprint, duplicates = find_duplicates(ingested[0])
+            duplicate_of = duplicates[0][1] if duplicates else None
+            held = duplicate_of is not None and current_app.config.get('DUPLICATE_UPLOAD_ACTION') == 'review'
             
-            file.save(save_path)
+            stored_filename = store_upload(*ingested)
+            enqueue('image_variants', filename=stored_filename)
             
             public_id = str(uuid.uuid4())
             hashtags = request.form.get('hashtags')
@@ -147,22 +216,44 @@ def submit():
             design = Design(
                 title=title, 
                 description=desc, 
-                image_filename=unique_filename,
+                image_filename=stored_filename,
                 hashtags=hashtags,
                 public_id=public_id,
-                author=current_user,
-                approved=True # Auto-approve for MVP
+                user_id=current_user.id,
+                duplicate_of=duplicate_of,
+                approved=not held # Auto-approve for MVP, unless held as a duplicate
             )
             db.session.add(design)
+            if design.approved:
+                update_hashtag_counts(new_hashtags=hashtags)
+            db.session.flush() # Get ID
+            sync_design_tags(design)
+            enqueue('index_design', design_id=design.id)
+            if fingerprint is not None:
+                store_fingerprint(design, fingerprint)
             db.session.commit()
+            
+            if duplicate_of:
+                message = f'This image looks almost identical to "{duplicate_of.title}" by {duplicate_of.author.name}.'
+                if held:
+                    flash(message + ' Your design will be published once an admin has reviewed it.', 'warning')
+                else:
+                    flash(message + ' Your design was posted and flagged for the admins.', 'warning')
+                return redirect(url_for('main.design_detail', public_id=duplicate_of.public_id))
             flash('Your design has been submitted successfully!', 'success')
             return redirect(url_for('main.index'))
     
     return render_template('submit.html')
 
 @bp.route('/design/<public_id>', methods=['GET', 'POST'])
+@query_budget(6)
+@conditional(design_validators)
 def design_detail(public_id):
-    design = Design.query.filter_by(public_id=public_id).first_or_404()
+    # Author, comments and comment authors up front so the template doesn't lazy-load per comment
+    design = Design.query.options(
+        joinedload(Design.author),
+        selectinload(Design.comments).joinedload(Comment.author)
+    ).filter_by(public_id=public_id).first_or_404()
     
     if request.method == 'POST':
         if not current_user.is_authenticated:
@@ -171,10 +262,11 @@ def design_detail(public_id):
         
         # Handle Comment
         if 'comment_content' in request.form:
-            content = request.form.get('comment_content')
+            content = normalize_content(request.form.get('comment_content'))
             if content:
-                comment = Comment(content=content, author=current_user, design=design)
+                comment = Comment(content=content, user_id=current_user.id, design=design)
                 db.session.add(comment)
+                bump_version(design)
                 db.session.commit()
                 flash('Comment added.', 'success')
         
@@ -183,14 +275,7 @@ def design_detail(public_id):
             try:
                 val = int(request.form.get('rating_value'))
                 if 1 <= val <= 10:
-                    # Check if already rated
-                    existing = Rating.query.filter_by(user_id=current_user.id, design_id=design.id).first()
-                    if existing:
-                        existing.value = val
-                    else:
-                        rating = Rating(value=val, author=current_user, design=design)
-                        db.session.add(rating)
-                    db.session.commit()
+                    set_rating(current_user, design, val)
                     db.session.commit()
                     # flash(f'You rated this design {val}/10.', 'success')
             except ValueError:
@@ -204,15 +289,12 @@ def design_detail(public_id):
         if rating_obj:
             user_rating = rating_obj.value
 
-    # Calculate average rating
-    ratings = design.ratings
-    if ratings:
-        avg_rating = round(sum(r.value for r in ratings) / len(ratings), 1)
-    else:
-        avg_rating = 0
+    avg_rating = round(design.rating_avg, 1) if design.rating_count else 0
 
     return render_template('design_detail.html', design=design, user_rating=user_rating, avg_rating=avg_rating)
 @bp.route('/discuss', methods=['GET', 'POST'])
+@query_budget(5)
+@conditional(generation_validators)
 def discuss():
     # Admin defined subjects
     subjects = ['General', 'Design Feedback', 'Voting Process', 'Symbolism', 'Past Designs', 'Colonial Flags']
@@ -222,7 +304,7 @@ def discuss():
             return redirect(url_for('auth.login'))
             
         title = request.form.get('title')
-        content = request.form.get('content')
+        content = normalize_content(request.form.get('content'))
         subject = request.form.get('subject')
         # Admin check logic
         post_type = 'discussion'
@@ -233,14 +315,17 @@ def discuss():
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename != '' and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                unique_filename = f"{uuid.uuid4().hex}_{filename}"
-                save_path = os.path.join(current_app.root_path, 'static/uploads', unique_filename)
-                file.save(save_path)
-                image_filename = unique_filename
-        
-        post = Post(title=title, content=content, subject=subject, post_type=post_type, image_filename=image_filename, author=current_user)
+                try:
+                    image_filename = save_upload(file)
+                except UploadRejected as e:
+                    flash(str(e), 'error')
+                    return redirect(request.url)
+                enqueue('image_variants', filename=image_filename)
+        
+        post = Post(title=title, content=content, subject=subject, post_type=post_type, image_filename=image_filename, user_id=current_user.id)
         db.session.add(post)
+        db.session.flush() # Get ID
+        enqueue('index_post', post_id=post.id)
         db.session.commit()
         flash('Post created!', 'success')
         return redirect(url_for('main.discuss'))
@@ -249,16 +334,32 @@ def discuss():
     filter_type = request.args.get('filter')
     filter_subject = request.args.get('subject')
     
-    query = Post.query
+    query = Post.query.options(joinedload(Post.author))
     if filter_type:
         if filter_type == 'announcement':
             query = query.filter_by(post_type='announcement')
     if filter_subject:
         query = query.filter_by(subject=filter_subject)
         
-    posts = query.order_by(Post.created_at.desc()).all()
+    try:
+        page = keyset_paginate(query, [Post.created_at, Post.id], cursor=request.args.get('cursor'), per_page=20)
+    except InvalidCursor:
+        abort(400)
+    posts = page.items
+    comment_counts = get_comment_counts(posts)
     
-    return render_template('discuss.html', posts=posts, subjects=subjects)
+    if request.args.get('ajax'):
+        return jsonify({
+            'html': render_template('partials_post_list.html', posts=posts, comment_counts=comment_counts),
+            'next_cursor': page.next_cursor,
+            'has_next': page.has_next
+        })
+    
+    context = dict(posts=posts, subjects=subjects, comment_counts=comment_counts, page=page)
+    if current_app.config.get('STREAM_TEMPLATES'):
+        # Send the layout and sidebar while the post list is still rendering
+        return Response(buffered_stream(stream_template('discuss.html', **context)), mimetype='text/html')
+    return render_template('discuss.html', **context)
 
 @bp.route('/admin/users')
 @login_required
@@ -270,6 +371,66 @@ def admin_users():
     users = User.query.all()
     return render_template('admin_users.html', users=users)
 
+@bp.route('/admin/fragment-cache')
+@login_required
+def fragment_cache_stats():
+    if not current_user.is_admin:
+        abort(403)
+    # Counters are per worker process
+    return jsonify(fragment_cache.stats())
+
+@bp.route('/admin/user-cache')
+@login_required
+def user_cache_stats():
+    if not current_user.is_admin:
+        abort(403)
+    # Counters are per worker process
+    return jsonify(user_cache.stats())
+
+@bp.route('/admin/database')
+@login_required
+def database_stats():
+    if not current_user.is_admin:
+        abort(403)
+    # Counters are per worker process
+    return jsonify(pool_stats(db))
+
+@bp.route('/admin/jobs')
+@login_required
+def job_queue_stats():
+    if not current_user.is_admin:
+        abort(403)
+    return jsonify(queue_stats())
+
+@bp.route('/admin/duplicates')
+@login_required
+def admin_duplicates():
+    if not current_user.is_admin:
+        flash('Access denied.', 'error')
+        return redirect(url_for('main.index'))
+    
+    flagged = Design.query.options(
+        joinedload(Design.author), joinedload(Design.duplicate_of).joinedload(Design.author)
+    ).filter(Design.duplicate_of_id.isnot(None)).order_by(Design.created_at.desc()).all()
+    return render_template('admin_duplicates.html', flagged=flagged)
+
+@bp.route('/admin/duplicates/<public_id>/clear', methods=['POST'])
+@login_required
+def clear_duplicate_flag(public_id):
+    if not current_user.is_admin:
+        abort(403)
+    
+    design = Design.query.filter_by(public_id=public_id).first_or_404()
+    design.duplicate_of_id = None
+    if not design.approved:
+        # Held at upload; publishing it now
+        design.approved = True
+        update_hashtag_counts(new_hashtags=design.hashtags)
+    bump_version(design)
+    db.session.commit()
+    flash(f'"{design.title}" is no longer flagged as a duplicate.', 'success')
+    return redirect(url_for('main.admin_duplicates'))
+
 @bp.route('/admin/toggle_status/<int:user_id>', methods=['POST'])
 @login_required
 def toggle_admin_status(user_id):
@@ -283,6 +444,7 @@ def toggle_admin_status(user_id):
     else:
         user.is_admin = not user.is_admin
         db.session.commit()
+        user_cache.invalidate(user.id)
         status = "Admin" if user.is_admin else "User"
         flash(f'{user.name} is now an {status}.', 'success')
         
@@ -297,42 +459,47 @@ def edit_design(public_id):
     design = Design.query.filter_by(public_id=public_id).first_or_404()
     
     # Auth check
-    if design.author != current_user and not current_user.is_admin:
+    if design.user_id != current_user.id and not current_user.is_admin:
         abort(403)
         
     if request.method == 'POST':
         title = request.form.get('title')
-        description = request.form.get('description')
+        description = normalize_content(request.form.get('description'))
         hashtags = request.form.get('hashtags')
         
+        if design.approved:
+            update_hashtag_counts(design.hashtags, hashtags)
+        
         design.title = title
         design.description = description
         design.hashtags = hashtags
+        sync_design_tags(design)
+        bump_version(design)
         
         # Image handling
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename != '' and allowed_file(file.filename):
-                # Delete old image if exists
-                if design.image_filename:
-                    old_path = os.path.join(current_app.root_path, 'static/uploads', design.image_filename)
-                    if os.path.exists(old_path):
-                        os.remove(old_path)
+                # Save new first so a rejected upload leaves the old image in place
+                try:
+                    new_filename = save_upload(file)
+                except UploadRejected as e:
+                    db.session.rollback()
+                    flash(str(e), 'error')
+                    return redirect(request.url)
                 
-                # Save new
-                filename = secure_filename(file.filename)
-                unique_filename = f"{uuid.uuid4().hex}_{filename}"
-                save_path = os.path.join(current_app.root_path, 'static/uploads', unique_filename)
-                file.save(save_path)
-                design.image_filename = unique_filename
+                # Drop our reference to the old image (deleted if nothing else uses it)
+                release_upload(design.image_filename)
+                design.image_filename = new_filename
+                enqueue('image_variants', filename=new_filename)
+                enqueue('fingerprint_design', design_id=design.id)
         
         elif request.form.get('remove_image') == 'yes':
              if design.image_filename:
-                old_path = os.path.join(current_app.root_path, 'static/uploads', design.image_filename)
-                if os.path.exists(old_path):
-                    os.remove(old_path)
+                release_upload(design.image_filename)
                 design.image_filename = None
 
+        enqueue('index_design', design_id=design.id)
         db.session.commit()
         
         flash('Design updated successfully.', 'success')
@@ -345,7 +512,7 @@ def edit_design(public_id):
 def edit_post(post_id):
     post = Post.query.get_or_404(post_id)
     
-    if post.author != current_user and not current_user.is_admin:
+    if post.user_id != current_user.id and not current_user.is_admin:
         abort(403)
         
     # Subjects list for dropdown
@@ -353,8 +520,9 @@ def edit_post(post_id):
 
     if request.method == 'POST':
         post.title = request.form.get('title')
-        post.content = request.form.get('content')
+        post.content = normalize_content(request.form.get('content'))
         post.subject = request.form.get('subject')
+        bump_version(post)
         
         # Only admin can toggle type, but we keep existing type logic stable if not provided
         if current_user.is_admin:
@@ -367,26 +535,25 @@ def edit_post(post_id):
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename != '' and allowed_file(file.filename):
-                # Delete old image if exists
-                if post.image_filename:
-                    old_path = os.path.join(current_app.root_path, 'static/uploads', post.image_filename)
-                    if os.path.exists(old_path):
-                        os.remove(old_path)
+                # Save new first so a rejected upload leaves the old image in place
+                try:
+                    new_filename = save_upload(file)
+                except UploadRejected as e:
+                    db.session.rollback()
+                    flash(str(e), 'error')
+                    return redirect(request.url)
                 
-                # Save new
-                filename = secure_filename(file.filename)
-                unique_filename = f"{uuid.uuid4().hex}_{filename}"
-                save_path = os.path.join(current_app.root_path, 'static/uploads', unique_filename)
-                file.save(save_path)
-                post.image_filename = unique_filename
+                # Drop our reference to the old image (deleted if nothing else uses it)
+                release_upload(post.image_filename)
+                post.image_filename = new_filename
+                enqueue('image_variants', filename=new_filename)
         
         elif request.form.get('remove_image') == 'yes':
              if post.image_filename:
-                old_path = os.path.join(current_app.root_path, 'static/uploads', post.image_filename)
-                if os.path.exists(old_path):
-                    os.remove(old_path)
+                release_upload(post.image_filename)
                 post.image_filename = None
 
+        enqueue('index_post', post_id=post.id)
         db.session.commit()
         flash('Post updated.', 'success')
         return redirect(url_for('main.discuss'))
@@ -419,7 +586,11 @@ def convert_post_to_design(post_id):
         approved=True # Admin action implies approval
     )
     db.session.add(design)
+    update_hashtag_counts(new_hashtags=design.hashtags)
     db.session.flush() # Get ID
+    sync_design_tags(design)
+    index_design(design)
+    enqueue('fingerprint_design', design_id=design.id)
     
     # Move comments
     for comment in post.comments:
@@ -435,6 +606,8 @@ def convert_post_to_design(post_id):
     # No, file deletion is manual in delete_post route.
     # So db.session.delete(post) is safe for the file.
     
+    unindex_post(post)
+    invalidate(post)
     db.session.delete(post)
     db.session.commit()
     
@@ -455,7 +628,7 @@ def convert_design_to_post(public_id):
     # Append hashtags to description if they exist, as posts don't have separate hashtags field
     content = design.description
     if design.hashtags:
-        content += f"\n\n{design.hashtags}"
+        content = normalize_content(content + f"\n\n{design.hashtags}")
         
     post = Post(
         title=design.title,
@@ -468,6 +641,7 @@ def convert_design_to_post(public_id):
     )
     db.session.add(post)
     db.session.flush() # Get ID
+    index_post(post)
     
     # Move comments
     for comment in design.comments:
@@ -479,6 +653,12 @@ def convert_design_to_post(public_id):
         db.session.delete(rating)
         
     # Delete Design
+    if design.approved:
+        update_hashtag_counts(old_hashtags=design.hashtags)
+    clear_design_tags(design)
+    unindex_design(design)
+    clear_fingerprint(design)
+    invalidate(design)
     db.session.delete(design)
     db.session.commit()
     
@@ -490,11 +670,13 @@ def convert_design_to_post(public_id):
 def edit_comment(comment_id):
     comment = Comment.query.get_or_404(comment_id)
     
-    if comment.author != current_user and not current_user.is_admin:
+    if comment.user_id != current_user.id and not current_user.is_admin:
         abort(403)
         
     if request.method == 'POST':
-        comment.content = request.form.get('content')
+        comment.content = normalize_content(request.form.get('content'))
+        if comment.design:
+            bump_version(comment.design)
         db.session.commit()
         flash('Comment updated.', 'success')
         
@@ -511,7 +693,7 @@ def edit_comment(comment_id):
 @login_required
 def delete_design(public_id):
     design = Design.query.filter_by(public_id=public_id).first_or_404()
-    if design.author != current_user and not current_user.is_admin:
+    if design.user_id != current_user.id and not current_user.is_admin:
         abort(403)
         
     if request.method == 'GET':
@@ -520,16 +702,19 @@ def delete_design(public_id):
                              item_title=design.title, 
                              cancel_url=url_for('main.design_detail', public_id=public_id))
         
-    # Delete image file if exists
-    if design.image_filename:
-        image_path = os.path.join(current_app.root_path, 'static/uploads', design.image_filename)
-        if os.path.exists(image_path):
-            os.remove(image_path)
+    # Delete image file unless another design/post shares it
+    release_upload(design.image_filename)
             
     # Delete associated comments and ratings
     Comment.query.filter_by(design_id=design.id).delete()
     Rating.query.filter_by(design_id=design.id).delete()
     
+    if design.approved:
+        update_hashtag_counts(old_hashtags=design.hashtags)
+    clear_design_tags(design)
+    unindex_design(design)
+    clear_fingerprint(design)
+    invalidate(design)
     db.session.delete(design)
     db.session.commit()
     flash('Design deleted.', 'success')
@@ -539,7 +724,7 @@ def delete_design(public_id):
 @login_required
 def delete_post(post_id):
     post = Post.query.get_or_404(post_id)
-    if post.author != current_user and not current_user.is_admin:
+    if post.user_id != current_user.id and not current_user.is_admin:
         abort(403)
         
     if request.method == 'GET':
@@ -548,12 +733,11 @@ def delete_post(post_id):
                              item_title=post.title, 
                              cancel_url=url_for('main.discuss'))
         
-    if post.image_filename:
-         image_path = os.path.join(current_app.root_path, 'static/uploads', post.image_filename)
-         if os.path.exists(image_path):
-             os.remove(image_path)
+    release_upload(post.image_filename)
              
     Comment.query.filter_by(post_id=post.id).delete()
+    unindex_post(post)
+    invalidate(post)
     db.session.delete(post)
     db.session.commit()
     flash('Post deleted.', 'success')
@@ -563,7 +747,7 @@ def delete_post(post_id):
 @login_required
 def delete_comment(comment_id):
     comment = Comment.query.get_or_404(comment_id)
-    if comment.author != current_user and not current_user.is_admin:
+    if comment.user_id != current_user.id and not current_user.is_admin:
         abort(403)
         
     design_public_id = comment.design.public_id if comment.design else None
@@ -575,6 +759,8 @@ def delete_comment(comment_id):
                              item_title=None, 
                              cancel_url=cancel_url)
     
+    if comment.design:
+        bump_version(comment.design)
     db.session.delete(comment)
     db.session.commit()
     flash('Comment deleted.', 'success')
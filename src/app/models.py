@@ -1,12 +1,8 @@
 from datetime import datetime
 import uuid
-from app import db, login_manager
+from app import db
 from flask_login import UserMixin
 
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     google_id = db.Column(db.String(100), unique=True, nullable=True) # Nullable for local testing if needed
@@ -31,11 +27,28 @@ class Design(db.Model):
     image_filename = db.Column(db.String(100), nullable=False)
     hashtags = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
     approved = db.Column(db.Boolean, default=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
+    # Denormalized rating aggregates, maintained by app.ratings
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_avg = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    rating_bucket = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True) # round(avg), 0 if unrated
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1') # Bumped on every change; keys the card cache
+    duplicate_of_id = db.Column(db.Integer, db.ForeignKey('design.id'), nullable=True, index=True) # Set when the upload looked like an existing design
+    
     comments = db.relationship('Comment', backref='design', lazy=True)
     ratings = db.relationship('Rating', backref='design', lazy=True)
+    tags = db.relationship('Tag', secondary='design_tag', lazy=True, viewonly=True)
+    duplicate_of = db.relationship('Design', remote_side=[id], lazy=True)
+
+    # Composite keys for keyset pagination of the gallery (newest / top)
+    __table_args__ = (
+        db.Index('ix_design_created_at_id', 'created_at', 'id'),
+        db.Index('ix_design_rating_avg_id', 'rating_avg', 'id'),
+    )
 
     def __repr__(self):
         return f"Design('{self.title}', '{self.created_at}')"
@@ -48,10 +61,17 @@ class Post(db.Model):
     subject = db.Column(db.String(50), nullable=True)
     image_filename = db.Column(db.String(100), nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1') # Bumped on every change; keys the card cache
     
     comments = db.relationship('Comment', backref='post', lazy=True)
     
+    # Keyset pagination of the discussion board
+    __table_args__ = (
+        db.Index('ix_post_created_at_id', 'created_at', 'id'),
+    )
+    
     def __repr__(self):
         return f"Post('{self.title}', '{self.post_type}')"
 
@@ -59,6 +79,7 @@ class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     design_id = db.Column(db.Integer, db.ForeignKey('design.id'), nullable=True)
     post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=True)
@@ -68,3 +89,92 @@ class Rating(db.Model):
     value = db.Column(db.Integer, nullable=False) # 1-5 or 1-10
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     design_id = db.Column(db.Integer, db.ForeignKey('design.id'), nullable=False)
+
+class HashtagCount(db.Model):
+    # Materialized per-tag totals over approved designs, kept in sync by app.hashtags
+    tag = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0, index=True)
+
+    def __repr__(self):
+        return f"HashtagCount('{self.tag}', {self.count})"
+
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False) # Lowercased, e.g. '#3d'
+
+    def __repr__(self):
+        return f"Tag('{self.name}')"
+
+class DesignTag(db.Model):
+    # Normalized design <-> tag link, kept in sync with Design.hashtags by app.hashtags
+    design_id = db.Column(db.Integer, db.ForeignKey('design.id'), primary_key=True)
+    tag_id = db.Column(db.Integer, db.ForeignKey('tag.id'), primary_key=True)
+
+    __table_args__ = (
+        db.Index('ix_design_tag_tag_id_design_id', 'tag_id', 'design_id'),
+    )
+
+class ContentGeneration(db.Model):
+    # Single row (id=1) bumped on every content write; app.conditional uses it for list-page ETags
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class Job(db.Model):
+    # Background work queue, processed by `flask run-worker` (see app.jobs)
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}') # JSON keyword arguments for the handler
+    status = db.Column(db.String(20), nullable=False, default='queued') # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # The worker polls for the oldest runnable job
+    __table_args__ = (
+        db.Index('ix_job_status_run_after', 'status', 'run_after'),
+    )
+
+    def __repr__(self):
+        return f"Job({self.id}, '{self.kind}', '{self.status}')"
+
+class Blob(db.Model):
+    # One row per stored upload file (content-addressed); see app.uploads
+    sha256 = db.Column(db.String(64), primary_key=True)
+    filename = db.Column(db.String(100), unique=True, nullable=False) # <sha256>.<ext> under static/uploads
+    size = db.Column(db.Integer, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0) # Design/Post rows using the file
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"Blob('{self.filename}', {self.refcount})"
+
+class DesignFingerprint(db.Model):
+    # Perceptual hash of a design's image for near-duplicate detection; see app.fingerprints
+    design_id = db.Column(db.Integer, db.ForeignKey('design.id'), primary_key=True)
+    dhash = db.Column(db.String(96), nullable=False) # 384-bit dHash (R, G, B x horizontal, vertical) as hex
+    image_filename = db.Column(db.String(100), nullable=False) # Image the hash was computed from
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    seq = db.Column(db.Integer, nullable=False, index=True) # Commit order of writes; see FingerprintIndex.refresh
+
+    def __repr__(self):
+        return f"DesignFingerprint({self.design_id}, '{self.dhash}')"
+
+class ImportRecord(db.Model):
+    # One row per Takeout source file imported by the maintenance scripts; see app.imports
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(500), unique=True, nullable=False) # Relative to the archive directory
+    size = db.Column(db.Integer, nullable=False)
+    mtime = db.Column(db.Float, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    target_type = db.Column(db.String(10), nullable=True) # 'Post' or 'Design'; None if the file produced nothing
+    target_id = db.Column(db.Integer, nullable=True)
+    imported_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"ImportRecord('{self.path}', {self.target_type} {self.target_id})"
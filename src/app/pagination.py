@@ -0,0 +1,63 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import tuple_
+
+KeysetPage = namedtuple('KeysetPage', ['items', 'next_cursor', 'has_next'])
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    # Opaque to the client: urlsafe base64 of the JSON key values
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        raise InvalidCursor(cursor)
+
+    values = []
+    for column, value in zip(columns, payload):
+        try:
+            if column.type.python_type is datetime:
+                value = datetime.fromisoformat(value)
+            else:
+                value = column.type.python_type(value)
+        except (ValueError, TypeError):
+            raise InvalidCursor(cursor)
+        values.append(value)
+    return values
+
+
+def keyset_paginate(query, columns, cursor=None, per_page=20):
+    """Page through query in descending order of columns.
+
+    The last column must be unique (normally the primary key) so the
+    ordering is total. Instead of OFFSET, the cursor carries the sort key
+    of the last row served and the next page starts strictly after it, so
+    every page costs one index range scan and no COUNT.
+    """
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        query = query.filter(tuple_(*columns) < tuple_(*values))
+
+    rows = query.order_by(*[c.desc() for c in columns]).limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    items = rows[:per_page]
+
+    next_cursor = None
+    if has_next:
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+    return KeysetPage(items, next_cursor, has_next)
@@ -0,0 +1,33 @@
+from functools import wraps
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def query_budget(limit):
+    """Cap the number of SQL statements a view may run for a GET.
+
+    Going over the budget means an N+1 has crept back into the view or
+    its templates. It is logged as a warning, or raised when
+    QUERY_BUDGET_RAISE is set (useful while developing).
+    The count includes the flask_login user lookup.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            response = f(*args, **kwargs)
+            used = g.get('query_count', 0)
+            if request.method == 'GET' and used > limit:
+                message = f"Query budget exceeded for {request.endpoint}: {used} > {limit}"
+                if current_app.config.get('QUERY_BUDGET_RAISE'):
+                    raise RuntimeError(message)
+                current_app.logger.warning(message)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,53 @@
+from sqlalchemy import case, cast, func
+from app import db
+from app.models import Design, Rating
+from app.fragments import fragment_cache
+
+
+def apply_rating_change(design_id, count_delta, sum_delta):
+    """Adjust a design's rating aggregates in place.
+
+    Done as one relative UPDATE so concurrent raters can't lose each
+    other's changes. The right-hand sides see the pre-update values.
+    Nothing is committed; the caller's commit covers it.
+    """
+    new_count = Design.rating_count + count_delta
+    new_avg = case(
+        (new_count > 0, (Design.rating_sum + sum_delta) * 1.0 / new_count),
+        else_=0
+    )
+    Design.query.filter_by(id=design_id).update({
+        Design.rating_count: new_count,
+        Design.rating_sum: Design.rating_sum + sum_delta,
+        Design.rating_avg: new_avg,
+        # Same rounding as SQL round(avg()) for positive values
+        Design.rating_bucket: cast(new_avg + 0.5, db.Integer),
+        Design.version: Design.version + 1,
+    }, synchronize_session=False)
+    fragment_cache.invalidate('design', design_id)
+
+
+def set_rating(user, design, value):
+    # Create or change the user's rating and keep the aggregates in step
+    existing = Rating.query.filter_by(user_id=user.id, design_id=design.id).first()
+    if existing:
+        apply_rating_change(design.id, 0, value - existing.value)
+        existing.value = value
+    else:
+        db.session.add(Rating(value=value, user_id=user.id, design=design))
+        apply_rating_change(design.id, 1, value)
+
+
+def rebuild_rating_aggregates():
+    # Recompute every design's aggregates from the rating table
+    rows = db.session.query(
+        Rating.design_id, func.count(Rating.id), func.sum(Rating.value)
+    ).group_by(Rating.design_id)
+    totals = {design_id: (count, total) for design_id, count, total in rows}
+    for design in Design.query:
+        count, total = totals.get(design.id, (0, 0))
+        design.rating_count = count
+        design.rating_sum = total
+        design.rating_avg = total / count if count else 0
+        design.rating_bucket = int(design.rating_avg + 0.5)
+    db.session.commit()
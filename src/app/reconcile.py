@@ -0,0 +1,123 @@
+import json
+import time
+from collections import Counter, namedtuple
+from datetime import datetime
+from app import db
+from app.imports import MODELS
+
+# Takeout entries against the Post/Design tables, in bulk. Both tables'
+# keys are read once (no content columns) into dicts, so checking a
+# whole archive is a handful of queries instead of two per file.
+
+Row = namedtuple('Row', 'type id title created_at image_filename')
+
+STATUSES = ('present', 'needs_image', 'missing', 'skipped')
+
+
+class RowIndex:
+    """Title and (title, created_at) lookups over every Post and Design."""
+
+    def __init__(self):
+        self.by_key = {}    # (type, id) -> Row
+        self.by_title = {}  # title -> [Row], Posts before Designs, by id
+        for name, model in MODELS.items():
+            query = db.session.query(model.id, model.title, model.created_at, model.image_filename).order_by(model.id)
+            for row_id, title, created_at, image_filename in query:
+                row = Row(name, row_id, title, created_at, image_filename)
+                self.by_key[(name, row_id)] = row
+                self.by_title.setdefault(title, []).append(row)
+
+    def get(self, target_type, target_id):
+        return self.by_key.get((target_type, target_id))
+
+    def find(self, title, created_at=None):
+        """(row, 'title+date' or 'title'), or (None, None).
+
+        Several rows can share a title; the one created at the same moment
+        wins, else the first Post, else the first Design, which is what the
+        per-file filter_by(title=...).first() lookups returned.
+        """
+        rows = self.by_title.get(title)
+        if not rows:
+            return None, None
+        if created_at is not None:
+            for row in rows:
+                if row.created_at == created_at:
+                    return row, 'title+date'
+        return rows[0], 'title'
+
+
+def reconcile(index, manifest=None):
+    """Classify every entry of an ArchiveIndex against the database.
+
+    Each item is matched through its import record if it has one (and
+    the row still exists), else by title and date. Status is one of
+    present, needs_image (row found without an image, the file has one),
+    missing, or skipped (the manifest says the file was deliberately not
+    imported). Returns the report dict write_report() serialises.
+    """
+    started = time.perf_counter()
+    rows = RowIndex()
+    items = []
+    for entry in index.entries():
+        row, match = None, None
+        record = manifest.get(entry['path']) if manifest else None
+        if record is not None:
+            row = rows.get(record.target_type, record.target_id)
+            match = 'manifest' if row else None
+        if row is None:
+            row, match = rows.find(entry['title'], entry['created_at'])
+
+        if row is not None:
+            status = 'needs_image' if not row.image_filename and entry['image_path'] else 'present'
+        elif record is not None and record.target_type is None:
+            status = 'skipped'
+        else:
+            status = 'missing'
+
+        items.append({
+            'path': manifest.key(entry['path']) if manifest else entry['path'],
+            'title': entry['title'],
+            'created_at': entry['created_at'].isoformat() if entry['created_at'] else None,
+            'status': status,
+            'match': match,
+            'target_type': row.type if row else None,
+            'target_id': row.id if row else None,
+            'recorded': record is not None and row is not None and
+                        (record.target_type, record.target_id) == (row.type, row.id),
+            'image_path': entry['image_path'],
+        })
+
+    counts = Counter(item['status'] for item in items)
+    return {
+        'generated_at': datetime.utcnow().isoformat(),
+        'root': index.root,
+        'seconds': round(time.perf_counter() - started, 3),
+        'counts': {status: counts[status] for status in STATUSES},
+        'items': items,
+    }
+
+
+def load_targets(items):
+    """The Post/Design objects for report items, keyed (type, id).
+
+    One IN query per model and chunk, for the items a script is about to
+    modify.
+    """
+    wanted = {}
+    for item in items:
+        if item['target_type']:
+            wanted.setdefault(item['target_type'], set()).add(item['target_id'])
+    objects = {}
+    for name, ids in wanted.items():
+        model = MODELS[name]
+        ids = sorted(ids)
+        for i in range(0, len(ids), 500):  # well under SQLite's bound-parameter limit
+            for obj in model.query.filter(model.id.in_(ids[i:i + 500])):
+                objects[(name, obj.id)] = obj
+    return objects
+
+
+def write_report(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,142 @@
+import re
+from sqlalchemy import text, false, column
+from app import db
+from app.models import Design, Post
+
+# Designs and posts share one FTS5 table. The rowid encodes the source row
+# (id * 2 for designs, id * 2 + 1 for posts) so updates and deletes are a
+# rowid lookup instead of a scan.
+DESIGN = 0
+POST = 1
+
+# Han, kana, bopomofo and hangul. These scripts have no spaces between words,
+# so unicode61 would index a whole sentence as a single token.
+CJK_RUN = re.compile(r'[\u3040-\u30ff\u3100-\u312f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+')
+WORD = re.compile(r'\w+')
+
+
+def _bigrams(run):
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def fts_tokens(value):
+    """Rewrite text for the unicode61 tokenizer.
+
+    Each CJK run becomes its overlapping bigrams followed by its last
+    character, so every character starts exactly one token:
+    '國旗設計' -> '國旗 旗設 設計 計'. Other text is left alone.
+    """
+    if not value:
+        return ''
+
+    def expand(match):
+        run = match.group(0)
+        tokens = _bigrams(run)
+        if len(run) > 1:
+            tokens.append(run[-1])
+        return ' ' + ' '.join(tokens) + ' '
+
+    return CJK_RUN.sub(expand, value)
+
+
+def _quote(token):
+    return '"' + token.replace('"', '""') + '"'
+
+
+def fts_query(q):
+    # Build an FTS5 MATCH expression: every term must match (implicit AND)
+    terms = []
+    for chunk in (q or '').split():
+        pos = 0
+        for match in CJK_RUN.finditer(chunk):
+            terms.extend(_quote(w) + '*' for w in WORD.findall(chunk[pos:match.start()]))
+            run = match.group(0)
+            if len(run) == 1:
+                # Any bigram starting with the character, or a trailing unigram
+                terms.append(_quote(run) + '*')
+            else:
+                terms.append(_quote(' '.join(_bigrams(run))))
+            pos = match.end()
+        terms.extend(_quote(w) + '*' for w in WORD.findall(chunk[pos:]))
+    return ' '.join(terms)
+
+
+def search_enabled():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def _upsert(rowid, title, body):
+    db.session.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {'rowid': rowid})
+    db.session.execute(
+        text("INSERT INTO search_index (rowid, title, body) VALUES (:rowid, :title, :body)"),
+        {'rowid': rowid, 'title': fts_tokens(title), 'body': fts_tokens(body)}
+    )
+
+
+def _remove(rowid):
+    db.session.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {'rowid': rowid})
+
+
+def index_design(design):
+    # Call after the design has an id; runs inside the caller's transaction
+    if not search_enabled():
+        return
+    _upsert(design.id * 2 + DESIGN, design.title, f"{design.description or ''}\n{design.hashtags or ''}")
+
+
+def index_post(post):
+    if not search_enabled():
+        return
+    _upsert(post.id * 2 + POST, post.title, post.content)
+
+
+def unindex_design(design):
+    if search_enabled():
+        _remove(design.id * 2 + DESIGN)
+
+
+def unindex_post(post):
+    if search_enabled():
+        _remove(post.id * 2 + POST)
+
+
+def search_ids(q, kind, limit=None):
+    """Ids of designs or posts matching q, best match first.
+
+    bm25 weights title hits 3x over body hits.
+    """
+    match = fts_query(q)
+    if not match:
+        return []
+    sql = ("SELECT rowid FROM search_index WHERE search_index MATCH :match "
+           "AND rowid % 2 = :kind ORDER BY bm25(search_index, 3.0, 1.0)")
+    params = {'match': match, 'kind': kind}
+    if limit:
+        sql += " LIMIT :limit"
+        params['limit'] = limit
+    return [rowid // 2 for (rowid,) in db.session.execute(text(sql), params)]
+
+
+def design_search_filter(q):
+    """WHERE clause for approved-design queries: Design.id is an FTS match.
+
+    Stays in SQL as a subquery, so a feed page never materialises the
+    whole match list and keyset pagination can stop after one page.
+    """
+    match = fts_query(q)
+    if not match:
+        return false()
+    matches = text("SELECT rowid / 2 AS id FROM search_index WHERE search_index MATCH :match "
+                   "AND rowid % 2 = :kind").bindparams(match=match, kind=DESIGN).columns(column('id'))
+    return Design.id.in_(matches)
+
+
+def rebuild_search_index():
+    db.session.execute(text("DELETE FROM search_index"))
+    for design in Design.query.yield_per(500):
+        index_design(design)
+    for post in Post.query.yield_per(500):
+        index_post(post)
+    db.session.commit()
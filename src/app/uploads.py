@@ -0,0 +1,322 @@
+import hashlib
+import io
+import os
+import uuid
+from flask import current_app
+from sqlalchemy import event, func, update
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Blob, Design, Post
+from app.images import upload_dir, remove_variants
+from app.fragments import bump_version
+
+try:
+    from PIL import Image
+except ImportError:  # dimension caps are skipped without Pillow
+    Image = None
+
+# Uploads are stored once per content, as static/uploads/<sha256>.<ext>.
+# The blob table counts how many Design/Post rows point at each file;
+# the file (and its variants) is deleted when the last reference goes,
+# after the transaction that dropped it commits.
+
+CHUNK_SIZE = 64 * 1024
+
+# Leading bytes -> stored extension. The client's filename is not trusted.
+SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+]
+
+
+class UploadRejected(ValueError):
+    # Message is shown to the user
+    pass
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _ext(name):
+    ext = os.path.splitext(name or '')[1].lower().split('?')[0]
+    if ext == '.jpeg':
+        ext = '.jpg'
+    return ext or '.jpg'
+
+
+def _temp_path():
+    # Same directory as the final file so the rename is atomic
+    return os.path.join(upload_dir(), f".tmp-{uuid.uuid4().hex}")
+
+
+def format_size(num_bytes):
+    if num_bytes >= 1024 * 1024:
+        return f"{num_bytes / (1024 * 1024):.0f} MB"
+    return f"{num_bytes / 1024:.0f} KB"
+
+
+def sniff_type(head):
+    for magic, ext in SIGNATURES:
+        if head.startswith(magic):
+            return ext
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return '.webp'
+    return None
+
+
+def _check_pixels(source, max_pixels):
+    """Raise UploadRejected if the image is over max_pixels.
+
+    Only the header is parsed. Returns False if the size couldn't be
+    read from source (e.g. a JPEG header past the first chunk).
+    """
+    if Image is None or not max_pixels:
+        return True
+    try:
+        with Image.open(source) as img:
+            width, height = img.size
+    except Image.DecompressionBombError:
+        raise UploadRejected('Image dimensions are too large.')
+    except (OSError, SyntaxError, ValueError):
+        return False
+    if width * height > max_pixels:
+        raise UploadRejected(f'Image dimensions are too large ({width}x{height}).')
+    return True
+
+
+def ingest(stream, max_bytes=None, max_pixels=None, fallback_ext=None):
+    """Copy stream to a temp file in fixed-size chunks.
+
+    The SHA-256 and the file type are worked out while writing, and the
+    size and dimension caps are checked as soon as the bytes that decide
+    them arrive, so a rejected upload stops early and never holds more
+    than one chunk in memory. Returns (temp_path, sha256, ext); the
+    caller moves the file into place.
+    """
+    temp_path = _temp_path()
+    digest = hashlib.sha256()
+    size = 0
+    ext = None
+    dimensions_checked = False
+    try:
+        with open(temp_path, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if ext is None:
+                    ext = sniff_type(chunk) or fallback_ext
+                    if ext is None:
+                        raise UploadRejected('Unsupported image type. Please upload a PNG, JPEG, GIF or WebP file.')
+                    dimensions_checked = _check_pixels(io.BytesIO(chunk), max_pixels)
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadRejected(f'Image is too large (limit {format_size(max_bytes)}).')
+                digest.update(chunk)
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+
+        if ext is None:
+            raise UploadRejected('The uploaded file is empty.')
+        if not dimensions_checked and not _check_pixels(temp_path, max_pixels):
+            raise UploadRejected('Could not read the image.')
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return temp_path, digest.hexdigest(), ext
+
+
+def _retain(sha256, filename, size):
+    """Count one more reference to sha256.
+
+    Returns (stored filename, created): the existing blob's filename, or
+    filename for a new row. Relative UPDATE so concurrent uploads of the
+    same bytes don't lose counts.
+    """
+    updated = Blob.query.filter_by(sha256=sha256).update(
+        {'refcount': Blob.refcount + 1}, synchronize_session=False)
+    if updated:
+        return db.session.query(Blob.filename).filter_by(sha256=sha256).scalar(), False
+    db.session.add(Blob(sha256=sha256, filename=filename, size=size, refcount=1))
+    db.session.flush()
+    return filename, True
+
+
+def _store(temp_path, sha256, ext):
+    """Atomically move an ingested temp file to its content address.
+
+    Returns the stored filename. If the same bytes are already stored
+    the temp file is dropped and the existing blob gains a reference.
+    Runs inside the caller's transaction.
+
+    The reference is counted before the file is placed. That write takes
+    SQLite's write lock, which a release of the same bytes also needs to
+    delete the file (_delete_released): either the release went first and
+    this blob row is new, so our copy is put in place, or it waits for
+    this transaction and then sees the row and keeps the file.
+    """
+    filename, created = _retain(sha256, f"{sha256}{ext}", os.path.getsize(temp_path))
+    final_path = os.path.join(upload_dir(), filename)
+    if created or not os.path.exists(final_path):
+        os.replace(temp_path, final_path)
+    else:
+        os.remove(temp_path)
+    return filename
+
+
+def save_upload(file):
+    """Store a werkzeug FileStorage from request.files; returns the filename.
+
+    Raises UploadRejected for files over UPLOAD_MAX_BYTES or
+    UPLOAD_MAX_PIXELS, or that aren't a supported image.
+    """
+    return store_upload(*ingest_upload(file))
+
+
+def ingest_upload(file):
+    """First half of save_upload(): the checked temp file, no database access.
+
+    Returns (temp_path, sha256, ext) for store_upload(), so a caller can
+    look at the image (e.g. hash it) before taking the write lock.
+    """
+    config = current_app.config
+    return ingest(file.stream,
+                  max_bytes=config.get('UPLOAD_MAX_BYTES'),
+                  max_pixels=config.get('UPLOAD_MAX_PIXELS'))
+
+
+def store_upload(temp_path, sha256, ext):
+    """Second half of save_upload(); returns the stored filename."""
+    return _store(temp_path, sha256, ext)
+
+
+def import_file(src_path):
+    # For maintenance scripts copying images in from an archive; no caps
+    with open(src_path, 'rb') as f:
+        temp_path, sha256, ext = ingest(f, fallback_ext=_ext(src_path))
+    return _store(temp_path, sha256, ext)
+
+
+def retain_upload(filename):
+    # Another row now points at an already stored file
+    blob = Blob.query.filter_by(filename=filename).first()
+    if blob:
+        _retain(blob.sha256, filename, blob.size)
+
+
+def release_upload(filename):
+    """Drop one reference; delete the file once nothing points at it.
+
+    The file is only removed after the caller commits, so a rolled back
+    delete still has its image. Files from before the blob table (not
+    yet backfilled) have no row and go on the same commit, as before.
+    """
+    if not filename:
+        return
+    blob = Blob.query.filter_by(filename=filename).first()
+    if blob:
+        Blob.query.filter_by(sha256=blob.sha256).update(
+            {'refcount': Blob.refcount - 1}, synchronize_session=False)
+        db.session.refresh(blob)
+        if blob.refcount > 0:
+            return
+        db.session.delete(blob)
+    db.session.info.setdefault('released_uploads', set()).add(filename)
+
+
+@event.listens_for(Session, 'after_commit')
+def _commit_released(session):
+    # The session can't run SQL until its transaction has closed and given
+    # back its connection (the only writer connection under the WAL
+    # profile); _delete_released picks these up then
+    released = session.info.pop('released_uploads', None)
+    if released:
+        session.info.setdefault('committed_releases', set()).update(released)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _keep_released(session):
+    session.info.pop('released_uploads', None)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _delete_released(session, transaction):
+    if transaction.parent is not None:
+        return
+    released = session.info.pop('committed_releases', None)
+    if not released:
+        return
+    with db.engine.begin() as conn:
+        for filename in released:
+            # A no-op write: takes the write lock, so an upload of the same
+            # bytes can't count a new reference until the file is gone (see
+            # _store), and its rowcount says whether one already did
+            still_used = conn.execute(update(Blob).where(Blob.filename == filename)
+                                      .values(refcount=Blob.refcount)).rowcount
+            if still_used:
+                continue
+            path = os.path.join(upload_dir(), filename)
+            if os.path.exists(path):
+                os.remove(path)
+            remove_variants(filename)
+
+
+def rebuild_blobs():
+    """Move every referenced upload to its content address and recount.
+
+    Rows pointing at identical bytes end up sharing one file; the
+    duplicate copies are deleted. Returns (blobs, duplicates_removed,
+    missing, renamed) where renamed maps old filename -> new filename.
+    """
+    refs = {}
+    for model in (Design, Post):
+        for obj in model.query.filter(model.image_filename.isnot(None)):
+            refs.setdefault(obj.image_filename, []).append(obj)
+
+    renamed = {}
+    canonical = {}  # sha256 -> stored filename
+    counts = {}
+    missing = 0
+    duplicates = 0
+    for old_name, objs in refs.items():
+        path = os.path.join(upload_dir(), old_name)
+        if not os.path.exists(path):
+            missing += 1
+            continue
+        sha256 = hash_file(path)
+        new_name = canonical.setdefault(sha256, f"{sha256}{_ext(old_name)}")
+        new_path = os.path.join(upload_dir(), new_name)
+        if old_name != new_name:
+            if os.path.exists(new_path):
+                os.remove(path)
+                duplicates += 1
+            else:
+                os.replace(path, new_path)
+            remove_variants(old_name)
+            renamed[old_name] = new_name
+            for obj in objs:
+                obj.image_filename = new_name
+                bump_version(obj)
+        counts[sha256] = counts.get(sha256, 0) + len(objs)
+
+    Blob.query.delete()
+    for sha256, refcount in counts.items():
+        filename = canonical[sha256]
+        db.session.add(Blob(sha256=sha256, filename=filename,
+                            size=os.path.getsize(os.path.join(upload_dir(), filename)),
+                            refcount=refcount))
+    return len(counts), duplicates, missing, renamed
+
+
+def blob_stats():
+    row = db.session.query(func.count(Blob.sha256), func.sum(Blob.size), func.sum(Blob.refcount)).one()
+    return {'blobs': row[0], 'bytes': row[1] or 0, 'references': row[2] or 0}
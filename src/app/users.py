@@ -0,0 +1,129 @@
+import os
+import threading
+import uuid
+import time
+from collections import OrderedDict
+from flask_login import UserMixin
+from app import db, login_manager
+from app.models import User
+
+
+class CachedUser(UserMixin):
+    """What current_user is for logged-in requests: the columns templates
+    and permission checks read, without an ORM row. Code that needs the
+    row (relationships, writes) loads it by id."""
+
+    __slots__ = ('id', 'name', 'is_admin', 'profile_pic')
+
+    def __init__(self, id, name, is_admin, profile_pic):
+        self.id = id
+        self.name = name
+        self.is_admin = bool(is_admin)
+        self.profile_pic = profile_pic
+
+    def __repr__(self):
+        return f"CachedUser({self.id}, '{self.name}')"
+
+
+class UserCache:
+    """Per-process TTL/LRU of CachedUser records for the login loader.
+
+    Writes that change a user call invalidate() after committing. Besides
+    dropping the local entry, that replaces a stamp file in the instance
+    folder; every worker stats it on each lookup and empties its cache
+    when it changed, so a demoted admin loses admin rights on the next
+    request in every process (one stat, no query). Workers sharing the
+    instance folder (one host, as SQLite requires) see it.
+    """
+
+    def __init__(self, max_entries=1000, ttl=60, stamp_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stamp_path = stamp_path
+        self._stamp = None  # (inode, mtime) of the stamp file when last checked
+        self._entries = OrderedDict()  # id -> (expires_at, CachedUser)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _read_stamp(self):
+        try:
+            st = os.stat(self.stamp_path)
+        except (OSError, TypeError):
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _check_stamp(self):
+        # Caller holds the lock
+        stamp = self._read_stamp()
+        if stamp != self._stamp:
+            self._entries.clear()
+            self._stamp = stamp
+
+    def get(self, user_id):
+        with self._lock:
+            self._check_stamp()
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def set(self, user):
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Drop user_id here and tell the other workers; call after commit."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+        if self.stamp_path:
+            # Replaced rather than touched: a new inode is a change even
+            # where mtime resolution is coarse
+            temp_path = f"{self.stamp_path}.{uuid.uuid4().hex}"
+            with open(temp_path, 'w') as f:
+                f.write(str(user_id))
+            os.replace(temp_path, self.stamp_path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None
+            }
+
+
+user_cache = UserCache()
+
+
+def init_user_cache(app):
+    user_cache.max_entries = app.config.get('USER_CACHE_SIZE', 1000)
+    user_cache.ttl = app.config.get('USER_CACHE_TTL', 60)
+    user_cache.stamp_path = os.path.join(app.instance_path, 'user_cache.stamp')
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    user_id = int(user_id)
+    user = user_cache.get(user_id)
+    if user is None:
+        row = db.session.query(User.id, User.name, User.is_admin, User.profile_pic).filter_by(id=user_id).first()
+        if row is None:
+            return None
+        user = CachedUser(*row)
+        user_cache.set(user)
+    return user
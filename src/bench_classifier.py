@@ -0,0 +1,82 @@
+"""Compare KeywordClassifier with the old per-keyword loops.
+
+Classifies the text of every design and post in the database (plus the
+Takeout index, if one has been built) with the loops, the classifier as
+configured (loops below AUTOMATON_MIN_KEYWORDS) and the automaton forced
+on, checks they agree, and times them with the real rule tables and with
+an enlarged one.
+
+    python bench_classifier.py [--repeat 5 --extra-keywords 2000]
+"""
+import argparse
+import os
+import random
+import time
+
+from app import create_app
+from app.models import Design, Post
+from app.archive import ArchiveIndex, INDEX_FILENAME
+from app.classifier import KeywordClassifier
+from migrate_gplus import KEYWORD_RULES, COLONIAL_KEYWORDS, GPLUS_DIR
+
+
+def loop_classify(rules, text):
+    # determine_type_and_category() before app.classifier
+    text = text.lower()
+    for keywords, label in rules:
+        for kw in keywords:
+            if kw.lower() in text:
+                return label
+    return None
+
+
+def timed(f, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = f()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def compare(name, rules, texts, repeat):
+    classifier = KeywordClassifier(rules)
+    automaton = KeywordClassifier(rules, min_keywords=0)
+    expected, loop_time = timed(lambda: [loop_classify(rules, t) for t in texts], repeat)
+    actual, classifier_time = timed(lambda: classifier.classify_many(texts), repeat)
+    forced, automaton_time = timed(lambda: automaton.classify_many(texts), repeat)
+    assert actual == expected and forced == expected, f"{name}: classifier and loops disagree"
+    keywords = sum(len(k) for k, _ in rules)
+    mode = 'automaton' if classifier.use_automaton else 'loops'
+    print(f"{name:<24} {keywords:>5} keywords  old loops {loop_time * 1000:7.1f} ms  "
+          f"classifier ({mode}) {classifier_time * 1000:7.1f} ms  "
+          f"forced automaton {automaton_time * 1000:7.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--extra-keywords', type=int, default=2000,
+                        help='Keywords added to the enlarged rule table.')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        texts = [f"{title} {body or ''}" for title, body in Design.query.with_entities(Design.title, Design.description)]
+        texts += [f"{title} {body or ''}" for title, body in Post.query.with_entities(Post.title, Post.content)]
+        if os.path.exists(os.path.join(app.instance_path, INDEX_FILENAME)):
+            texts += [f"{e['title']} {e['content']}" for e in ArchiveIndex(GPLUS_DIR).entries()]
+
+    chars = sum(len(t) for t in texts)
+    print(f"{len(texts)} documents, {chars / 1024:.0f} KiB of text, best of {args.repeat}")
+
+    compare('KEYWORD_RULES', KEYWORD_RULES, texts, args.repeat)
+    compare('colonial keywords', [(COLONIAL_KEYWORDS, True)], texts, args.repeat)
+
+    # Rule tables grow (tags, place names); random CJK bigrams that rarely
+    # match, ahead of the real rules so every document walks them all
+    rng = random.Random(0)
+    extra = [''.join(chr(rng.randint(0x4e00, 0x9fff)) for _ in range(2)) for _ in range(args.extra_keywords)]
+    enlarged = [(extra[i:i + 20], ('Post', f'extra-{i}')) for i in range(0, len(extra), 20)] + KEYWORD_RULES
+    compare(f'+{args.extra_keywords} keywords', enlarged, texts, args.repeat)
@@ -0,0 +1,143 @@
+"""Compare SQLite engine profiles under the production process layout.
+
+Runs the same mixed workload (card listings, design pages, ratings and
+comments) against a scratch copy of the database, once per profile, with
+several processes of several threads each, as gunicorn does.
+
+    python bench_sqlite.py [--processes 3 --threads 4 --seconds 10 --writes 0.2]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from config import Config
+
+
+def worker(profile, db_path, threads, seconds, write_ratio, results):
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    os.environ['SQLITE_PROFILE'] = profile
+    from sqlalchemy.exc import OperationalError
+    from app import create_app, db
+    from app.models import Design, Comment, User
+    from app.ratings import set_rating
+
+    class BenchConfig(Config):
+        SQLITE_PROFILE = profile
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{db_path}"
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        design_ids = [d for (d,) in db.session.query(Design.id).filter_by(approved=True)]
+        user_ids = [u for (u,) in db.session.query(User.id)]
+        db.session.remove()
+
+    counts = {'reads': 0, 'writes': 0, 'errors': 0, 'latencies': []}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def run():
+        rng = random.Random()
+        with app.app_context():
+            while time.monotonic() < deadline:
+                write = rng.random() < write_ratio
+                started = time.perf_counter()
+                try:
+                    if write:
+                        design = db.session.get(Design, rng.choice(design_ids))
+                        user = db.session.get(User, rng.choice(user_ids))
+                        if rng.random() < 0.5:
+                            set_rating(user, design, rng.randint(1, 10))
+                        else:
+                            db.session.add(Comment(content='bench', user_id=user.id, design_id=design.id))
+                        db.session.commit()
+                    else:
+                        Design.query.filter_by(approved=True).order_by(Design.created_at.desc()).limit(24).all()
+                        db.session.get(Design, rng.choice(design_ids)).comments
+                        db.session.rollback()
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        counts['writes' if write else 'reads'] += 1
+                        counts['latencies'].append(elapsed)
+                except OperationalError as e:
+                    db.session.rollback()
+                    if 'locked' not in str(e):
+                        raise
+                    with lock:
+                        counts['errors'] += 1
+            db.session.remove()
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    results.put(counts)
+
+
+def prepare(source, scratch):
+    # Migrated copy of the database, in the driver's default journal mode
+    from flask_migrate import upgrade
+    from app import create_app
+
+    class PrepareConfig(Config):
+        SQLITE_PROFILE = 'off'
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(scratch, 'template.db')}"
+
+    shutil.copy(source, os.path.join(scratch, 'template.db'))
+    app = create_app(PrepareConfig)
+    with app.app_context():
+        upgrade(directory=os.path.join(Config.basedir, 'migrations'))
+    return os.path.join(scratch, 'template.db')
+
+
+def run_profile(profile, template, args):
+    scratch = tempfile.mkdtemp()
+    db_path = os.path.join(scratch, 'bench.db')
+    shutil.copy(template, db_path)
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(profile, db_path, args.threads, args.seconds, args.writes, results))
+             for _ in range(args.processes)]
+    for p in procs:
+        p.start()
+    totals = {'reads': 0, 'writes': 0, 'errors': 0, 'latencies': []}
+    for _ in procs:
+        counts = results.get()
+        for key in totals:
+            totals[key] += counts[key]
+    for p in procs:
+        p.join()
+    shutil.rmtree(scratch)
+
+    latencies = sorted(totals['latencies'])
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+    ops = totals['reads'] + totals['writes']
+    print(f"{profile:>4}: {ops / args.seconds:8.1f} ops/s  ({totals['writes'] / args.seconds:.1f} writes/s)  "
+          f"locked errors: {totals['errors']}  p50 {p50:.1f} ms  p99 {p99:.1f} ms")
+    return ops
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--writes', type=float, default=0.2, help='Fraction of operations that write.')
+    parser.add_argument('--database', default=os.path.join(Config.basedir, 'instance', 'site.db'))
+    args = parser.parse_args()
+
+    print(f"{args.processes} processes x {args.threads} threads, {args.seconds:g}s, "
+          f"{args.writes:.0%} writes, copy of {args.database}")
+    scratch = tempfile.mkdtemp()
+    template = prepare(args.database, scratch)
+    baseline = run_profile('off', template, args)
+    tuned = run_profile('wal', template, args)
+    shutil.rmtree(scratch)
+    if baseline:
+        print(f"wal/off throughput: {tuned / baseline:.2f}x")
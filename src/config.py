@@ -7,6 +7,55 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'instance', 'site.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # SQLite engine profile (app.database): 'wal' sets WAL and the pragmas
+    # below and splits reads from writes; 'off' leaves the driver defaults
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'wal')
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)) # ms
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -32000)) # negative = KiB
+    SQLITE_READ_POOL_SIZE = int(os.environ.get('SQLITE_READ_POOL_SIZE', 8))
+    # Retries after SQLite gave up waiting for the write lock
+    DB_LOCK_RETRIES = int(os.environ.get('DB_LOCK_RETRIES', 3))
+    DB_LOCK_BACKOFF = float(os.environ.get('DB_LOCK_BACKOFF', 0.05)) # seconds, doubled per retry
+    # Raise instead of logging when a view runs more queries than its @query_budget
+    QUERY_BUDGET_RAISE = os.environ.get('QUERY_BUDGET_RAISE') == '1'
+    # Stream long pages (discussion board) instead of rendering them in one piece
+    STREAM_TEMPLATES = os.environ.get('STREAM_TEMPLATES') == '1'
+    
+    # Per-process cache of rendered design/post cards
+    FRAGMENT_CACHE_ENABLED = os.environ.get('FRAGMENT_CACHE_ENABLED', '1') == '1'
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 2000))
+    
+    # Per-process cache of the logged-in user's record (app.users); user
+    # changes reach other workers through a stamp file in the instance folder
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1000))
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+    
+    # Background jobs (app.jobs). JOBS_INLINE runs them in the request instead,
+    # for development without `flask run-worker`
+    JOBS_INLINE = os.environ.get('JOBS_INLINE') == '1'
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+    JOB_TIMEOUT = int(os.environ.get('JOB_TIMEOUT', 600)) # seconds before a 'running' job is considered abandoned
+    JOB_RETENTION_DAYS = int(os.environ.get('JOB_RETENTION_DAYS', 7))
+    JOB_STALL_AFTER = int(os.environ.get('JOB_STALL_AFTER', 300)) # seconds a queued job may wait before the worker counts as stalled
+    
+    # Uploads (app.uploads). MAX_CONTENT_LENGTH makes werkzeug refuse bigger
+    # request bodies up front; the slack covers the other form fields
+    UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 16 * 1024 * 1024))
+    UPLOAD_MAX_PIXELS = int(os.environ.get('UPLOAD_MAX_PIXELS', 50_000_000))
+    MAX_CONTENT_LENGTH = UPLOAD_MAX_BYTES + 1024 * 1024
+    
+    # Near-duplicate uploads (app.fingerprints): 'warn' publishes and flags the
+    # design for admins, 'review' holds it unapproved until an admin clears it
+    DUPLICATE_UPLOAD_ACTION = os.environ.get('DUPLICATE_UPLOAD_ACTION', 'warn')
+    
+    # Static files (app.assets). Hashed assets and uploads are cached for a
+    # year; STATIC_MAX_AGE covers everything else. STATIC_OFFLOAD hands the
+    # file transfer to the front proxy: 'x-accel-redirect' (nginx, internal
+    # location at STATIC_ACCEL_PREFIX) or 'x-sendfile' (Apache, lighttpd)
+    STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 3600))
+    STATIC_OFFLOAD = os.environ.get('STATIC_OFFLOAD')
+    STATIC_ACCEL_PREFIX = os.environ.get('STATIC_ACCEL_PREFIX', '/_static')
     
     # OAuth Keys
     GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
@@ -1,7 +1,11 @@
 from app import create_app, db
 from app.models import Design
+from app.hashtags import update_hashtag_counts, clear_design_tags
+from app.search import unindex_design
+from app.ratings import apply_rating_change
+from app.uploads import release_upload
+from app.fingerprints import clear_fingerprint
 from collections import defaultdict
-import os
 
 app = create_app()
 with app.app_context():
@@ -35,21 +39,12 @@ with app.app_context():
             for remove in remove_list:
                 print(f"  Deleting ID: {remove.id}")
                 
-                # Delete image file
+                # Drop this row's reference to the image. Duplicates usually share
+                # the content-addressed file with the kept row, whose reference keeps
+                # it alive; the file goes only when the refcount reaches zero
                 if remove.image_filename:
-                    # Check if the image filename is different from the kept one
-                    # If they share the SAME filename string, we must NOT delete it if we keep the other.
-                    # But the inspection showed different filenames (hashes).
-                    if remove.image_filename != keep.image_filename:
-                        path = os.path.join(app.root_path, 'static/uploads', remove.image_filename)
-                        if os.path.exists(path):
-                            try:
-                                os.remove(path)
-                                print(f"    Deleted image: {remove.image_filename}")
-                            except Exception as e:
-                                print(f"    Error deleting image: {e}")
-                    else:
-                        print(f"    Skipping image deletion (shared filename): {remove.image_filename}")
+                    release_upload(remove.image_filename)
+                    print(f"    Released image: {remove.image_filename}")
                 
                 # Reassign comments or ratings?
                 # If these are straight duplicates, likely they don't have user interaction yet (or split interaction).
@@ -64,7 +59,13 @@ with app.app_context():
                     c.design_id = keep.id
                 for r in remove.ratings:
                     r.design_id = keep.id
+                    apply_rating_change(keep.id, 1, r.value)
                 
+                if remove.approved:
+                    update_hashtag_counts(old_hashtags=remove.hashtags)
+                clear_design_tags(remove)
+                unindex_design(remove)
+                clear_fingerprint(remove)
                 db.session.delete(remove)
                 deleted_count += 1
                 
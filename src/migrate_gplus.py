@@ -1,12 +1,19 @@
 import os
-import glob
-import shutil
+import time
 import uuid
-from collections import defaultdict
-from bs4 import BeautifulSoup
+import argparse
 from datetime import datetime
 from app import create_app, db
-from app.models import User, Design, Post, Comment
+from app.models import User, Design, Post, DesignTag
+from app.hashtags import update_hashtag_counts, get_or_create_tags, parse_hashtags
+from app.search import index_design, index_post
+from app.content import normalize_content
+from app.fragments import bump_version
+from app.uploads import import_file
+from app.imports import ImportManifest
+from app.archive import load_index
+from app.jobs import enqueue_image_jobs
+from app.classifier import KeywordClassifier
 
 # Constants
 GPLUS_DIR = 'gplus/Google+ Communities/自己的國旗自己畫/Posts'
@@ -32,76 +39,21 @@ KEYWORD_RULES = [
     (['國徽', 'Emblem'], ('Design', '#Emblem')),
     (['平面', 'Graphic'], ('Design', '#GraphicDesign')),
 ]
+# Case-insensitive, first matching rule wins. Below AUTOMATON_MIN_KEYWORDS
+# (app.classifier) this runs the per-rule substring loops, not the automaton
+KEYWORD_CLASSIFIER = KeywordClassifier(KEYWORD_RULES)
 
-def parse_html_file(fpath):
-    with open(fpath, 'r', encoding='utf-8') as f:
-        soup = BeautifulSoup(f, 'html.parser')
-
-    # Content
-    content_div = soup.find('div', class_='main-content')
-    content = content_div.get_text('\n').strip() if content_div else ""
-    
-    # Title (Filename often contains it, or extract from content)
-    # The HTML title tag is often generic.
-    # The GPlus export uses the first few words as filename, or date.
-    # We'll use the first line of content as title, or filename if content empty.
-    filename_base = os.path.basename(fpath).replace('.html', '')
-    # Remove date prefix from filename "YYYYMMDD - "
-    if ' - ' in filename_base:
-        title_candidate = filename_base.split(' - ', 1)[1]
-    else:
-        title_candidate = filename_base
-        
-    if not content:
-        content = title_candidate
-    
-    title = title_candidate[:100] # Truncate to match DB limit
-
-    # Author
-    author_span = soup.find('span', itemprop='name')
-    author_name = author_span.get_text().strip() if author_span else "Unknown"
-    
-    # Date
-    date_span = soup.find('span', itemprop='dateCreated')
-    created_at = datetime.utcnow()
-    if date_span:
-        try:
-            # Format: 2014-06-08T06:53:14+0000
-            dt_str = date_span.get_text().strip()
-            # Python 3.12 might handle isoformat, but let's be safe with strptime/split
-            # Remove +0000 key for simple UTC
-            if '+' in dt_str:
-                dt_str = dt_str.split('+')[0]
-            created_at = datetime.strptime(dt_str, "%Y-%m-%dT%H:%M:%S")
-        except:
-            pass
-
-    # Image
-    image_filename = None
-    media_img = soup.find('img', class_='media')
-    if media_img and media_img.get('src'):
-        src = media_img['src']
-        # The src is often a relative path in the local folder
-        # Check if file exists
-        potential_path = os.path.join(os.path.dirname(fpath), src)
-        if os.path.exists(potential_path):
-            image_filename = potential_path
-
-    return {
-        'title': title,
-        'content': content,
-        'author_name': author_name,
-        'created_at': created_at,
-        'image_path': image_filename
-    }
+# reimport_colonial.py: posts about colonial-era and ROC flags
+COLONIAL_KEYWORDS = ['荷蘭', 'Dutch', '殖民', 'Colonial', '日本', 'Japanese', '美國', 'USMG', '西班牙', 'Spain', 'Spanish', '明', 'Ming', '清', 'Qing', 
+                     '蔣中正', 'Chiang', '國民黨', 'KMT', 'ROC', '中華民國']
+# Filenames are matched as-is, title and content case-insensitively
+COLONIAL_FILENAME_CLASSIFIER = KeywordClassifier([(COLONIAL_KEYWORDS, True)], case_sensitive=True)
+COLONIAL_TEXT_CLASSIFIER = KeywordClassifier([(COLONIAL_KEYWORDS, True)])
 
 def determine_type_and_category(parsed_data):
-    text = (parsed_data['title'] + " " + parsed_data['content']).lower()
-    
-    for keywords, (model_type, category) in KEYWORD_RULES:
-        for kw in keywords:
-            if kw.lower() in text:
-                return model_type, category
+    match = KEYWORD_CLASSIFIER.classify(parsed_data['title'] + " " + parsed_data['content'])
+    if match:
+        return match
     
     # Default
     if parsed_data['image_path']:
@@ -109,90 +61,212 @@ def determine_type_and_category(parsed_data):
     else:
         return 'Post', 'General'
 
-def migrate():
+def prepare(entry):
+    # Archive index entry -> what write_batch() takes
+    parsed = dict(entry, content=normalize_content(entry['content']),
+                  created_at=entry['created_at'] or datetime.utcnow())
+    parsed['model_type'], parsed['category'] = determine_type_and_category(parsed)
+    return parsed
+
+
+class AuthorMap:
+    """name -> user id for the whole run, loaded once.
+
+    Archive authors that don't exist yet are created in bulk per batch.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        for user_id, name in db.session.query(User.id, User.name).order_by(User.id.desc()):
+            self.ids[name] = user_id  # lowest id wins, as .first() did
+        self.emails = {email for (email,) in db.session.query(User.email)}
+
+    def resolve(self, names):
+        new_users = []
+        for name in dict.fromkeys(names):
+            if name in self.ids:
+                continue
+            email = f"{name.replace(' ', '.').lower()}@gplus.archive.local"
+            if email in self.emails:
+                email = f"{uuid.uuid4().hex[:8]}@gplus.archive.local"
+            self.emails.add(email)
+            user = User(name=name, email=email, google_id=f"gplus_{uuid.uuid4().hex}") # Fake google ID
+            new_users.append(user)
+            self.ids[name] = None
+        if new_users:
+            db.session.add_all(new_users)
+            db.session.flush()
+            for user in new_users:
+                self.ids[user.name] = user.id
+        return len(new_users)
+
+
+def _fill_image(target, parsed):
+    # Only when it will be referenced (import_file counts a reference)
+    if parsed['image_path'] and not target.image_filename:
+        target.image_filename = import_file(parsed['image_path'])
+        bump_version(target)
+        return True
+    return False
+
+
+def _refresh(target, parsed):
+    # The source file changed since it was imported. Subject/hashtags are
+    # left alone: admins may have recategorised the row since.
+    target.title = parsed['title']
+    target.created_at = parsed['created_at']
+    if isinstance(target, Design):
+        target.description = parsed['content']
+    else:
+        target.content = parsed['content']
+    filled = _fill_image(target, parsed)
+    bump_version(target)
+    return filled
+
+
+def write_batch(batch, authors, existing, manifest):
+    """Write one batch of parsed files, and their manifest records, in one transaction.
+
+    Files with a record update the row they produced. Files without one
+    are matched to rows imported before the manifest existed through
+    existing, which maps (model, title, created_at) -> id (or the new
+    object, for rows created earlier in this run); those only get a
+    missing image filled in. Returns (designs, posts, updated).
+    """
+    authors.resolve(parsed['author_name'] for parsed in batch)
+
+    designs = []
+    posts = []
+    changed = []
+    imaged = []  # existing rows that gained an image
+    sources = []  # (path, sha256, row or None)
+    updated = 0
+    for parsed in batch:
+        target = manifest.target(manifest.get(parsed['path']))
+        if target is not None:
+            if _refresh(target, parsed):
+                imaged.append(target)
+            changed.append(target)
+            sources.append((parsed['path'], parsed['sha256'], target))
+            updated += 1
+            continue
+
+        model = Design if parsed['model_type'] == 'Design' and parsed['image_path'] else \
+            Post if parsed['model_type'] == 'Post' else None
+        if model is None:
+            sources.append((parsed['path'], parsed['sha256'], None))
+            continue
+        key = (model.__name__, parsed['title'], parsed['created_at'])
+        match = existing.get(key)
+        if isinstance(match, int):
+            match = db.session.get(model, match)
+        if match is not None:
+            if _fill_image(match, parsed):
+                changed.append(match)
+                imaged.append(match)
+                updated += 1
+            sources.append((parsed['path'], parsed['sha256'], match))
+            continue
+
+        user_id = authors.ids[parsed['author_name']]
+        if model is Design:
+            target = Design(
+                public_id=str(uuid.uuid4()),
+                title=parsed['title'],
+                description=parsed['content'],
+                image_filename=import_file(parsed['image_path']), # content-addressed; re-runs reuse the stored file
+                hashtags=parsed['category'], # e.g. #3DVisual
+                created_at=parsed['created_at'],
+                approved=True,
+                user_id=user_id
+            )
+            designs.append(target)
+        else:
+            target = Post(
+                title=parsed['title'],
+                content=parsed['content'],
+                subject=parsed['category'], # e.g. "Voting Process"
+                post_type='discussion', # Default
+                created_at=parsed['created_at'],
+                image_filename=import_file(parsed['image_path']) if parsed['image_path'] else None,
+                user_id=user_id
+            )
+            posts.append(target)
+        existing[key] = target
+        sources.append((parsed['path'], parsed['sha256'], target))
+
+    db.session.add_all(designs)
+    db.session.add_all(posts)
+    db.session.flush()
+
+    # New designs have no tags yet, so link them directly rather than
+    # diffing each one through sync_design_tags()
+    categories = ' '.join(d.hashtags for d in designs)
+    update_hashtag_counts(new_hashtags=categories)
+    tags = get_or_create_tags(parse_hashtags(categories))
+    for design in designs:
+        for name in set(parse_hashtags(design.hashtags)):
+            db.session.add(DesignTag(design_id=design.id, tag_id=tags[name].id))
+    for row in designs + posts + changed:
+        if isinstance(row, Design):
+            index_design(row)
+        else:
+            index_post(row)
+    # Variants and fingerprints, as for an upload; visible to the worker on commit
+    enqueue_image_jobs(designs + posts + imaged)
+    for path, sha256, row in sources:
+        manifest.record(path, row, sha256)
+    db.session.commit()
+    return len(designs), len(posts), updated
+
+
+def migrate(workers=None, parser='html.parser', batch_size=200):
+    """Import new and changed Takeout files.
+
+    Parsing goes through the shared archive index (app.archive), which
+    only reparses files modified since the last run, in a process pool.
+    All database writes happen here, in one transaction per batch_size
+    files. Files the import manifest has seen unchanged are skipped.
+    """
     app = create_app()
     with app.app_context():
         # Ensure upload dir
         os.makedirs(UPLOAD_DIR, exist_ok=True)
-        
-        files = glob.glob(os.path.join(GPLUS_DIR, '*.html'))
-        print(f"Processing {len(files)} posts...")
-        
-        for fpath in files:
-            parsed = parse_html_file(fpath)
-            model_type, category = determine_type_and_category(parsed)
-            
-            # Find or Create User
-            user = User.query.filter_by(name=parsed['author_name']).first()
-            if not user:
-                # Create fake email
-                email = f"{parsed['author_name'].replace(' ', '.').lower()}@gplus.archive.local"
-                # Handle duplicates
-                if User.query.filter_by(email=email).first():
-                    email = f"{uuid.uuid4().hex[:8]}@gplus.archive.local"
-                    
-                user = User(
-                    name=parsed['author_name'],
-                    email=email,
-                    google_id=f"gplus_{uuid.uuid4().hex}" # Fake google ID
-                )
-                db.session.add(user)
-                db.session.commit()
-            
-            if model_type == 'Design' and parsed['image_path']:
-                # Copy Image
-                ext = os.path.splitext(parsed['image_path'])[1]
-                new_filename = f"{uuid.uuid4().hex}{ext}"
-                shutil.copy(parsed['image_path'], os.path.join(UPLOAD_DIR, new_filename))
-                
-                design = Design(
-                    public_id=str(uuid.uuid4()),
-                    title=parsed['title'],
-                    description=parsed['content'],
-                    image_filename=new_filename,
-                    hashtags=category, # e.g. #3DVisual
-                    created_at=parsed['created_at'],
-                    approved=True,
-                    author=user
-                )
-                db.session.add(design)
-                print(f"[Design] Imported: {parsed['title'][:30]}")
-                
-            elif model_type == 'Post':
-                # Map category to subject
-                post = Post(
-                    title=parsed['title'],
-                    content=parsed['content'],
-                    subject=category, # e.g. "Voting Process"
-                    post_type='discussion', # Default
-                    created_at=parsed['created_at'],
-                    author=user
-                )
-                if parsed['image_path']:
-                     # Copy Image
-                    ext = os.path.splitext(parsed['image_path'])[1]
-                    new_filename = f"{uuid.uuid4().hex}{ext}"
-                    shutil.copy(parsed['image_path'], os.path.join(UPLOAD_DIR, new_filename))
-                    post.image_filename = new_filename
-                
-                db.session.add(post)
-                # Check if it was a duplicate import (avoid errors if we re-run)
-                # For this script we are doing naive imports. 
-                # Ideally we should check if post with same title/date already exists.
-                # But user asked to "import images that were left out", implying re-run or update.
-                # Since we didn't add uniqueness constraints on title, we might duplicate posts if we just re-run.
-                # Let's check for existence first.
-                exists = Post.query.filter_by(title=parsed['title'], created_at=parsed['created_at']).first()
-                if not exists:
-                     print(f"[Post]   Imported: {parsed['title'][:30]}")
-                else:
-                     # Update existing post if it doesn't have image but we found one
-                     if not exists.image_filename and parsed['image_path']:
-                          exists.image_filename = new_filename
-                          print(f"[Post]   Updated image: {parsed['title'][:30]}")
-                     db.session.expunge(post) # Don't add new one
-            
-            db.session.commit()
+
+        index = load_index(GPLUS_DIR, workers=workers, parser=parser)
+        manifest = ImportManifest(GPLUS_DIR)
+        pending = [entry for entry in index.entries()
+                   if manifest.status(entry['path'], sha256=entry['sha256']) != 'unchanged']
+        db.session.commit() # mtimes of touched-but-identical files
+        print(f"{len(index)} files, {len(index) - len(pending)} unchanged since the last import.")
+        if not pending:
+            return
+
+        authors = AuthorMap()
+        existing = {}
+        for model in (Design, Post):
+            for row_id, title, created_at in db.session.query(model.id, model.title, model.created_at).order_by(model.id.desc()):
+                existing[(model.__name__, title, created_at)] = row_id
+
+        started = time.perf_counter()
+        totals = [0, 0, 0]
+        for start in range(0, len(pending), batch_size):
+            batch = [prepare(entry) for entry in pending[start:start + batch_size]]
+            totals = [a + b for a, b in zip(totals, write_batch(batch, authors, existing, manifest))]
+            done = start + len(batch)
+            elapsed = time.perf_counter() - started
+            print(f"  {done}/{len(pending)} files, {done / elapsed:.1f} files/sec")
+
+        elapsed = time.perf_counter() - started
+        print(f"Imported {totals[0]} designs and {totals[1]} posts, updated {totals[2]} existing rows.")
+        print(f"{len(pending)} files written in {elapsed:.1f}s ({len(pending) / elapsed if elapsed else 0:.1f} files/sec).")
+
 
 if __name__ == '__main__':
-    migrate()
+    arg_parser = argparse.ArgumentParser(description='Import the Google+ community Takeout.')
+    arg_parser.add_argument('--workers', type=int, help='Parser processes (default: one per CPU).')
+    arg_parser.add_argument('--parser', default='html.parser',
+                            help="BeautifulSoup backend; 'lxml' is several times faster if installed.")
+    arg_parser.add_argument('--batch-size', type=int, default=200, help='Files per transaction.')
+    args = arg_parser.parse_args()
+    migrate(workers=args.workers, parser=args.parser, batch_size=args.batch_size)
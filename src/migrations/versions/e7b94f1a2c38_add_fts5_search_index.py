@@ -0,0 +1,77 @@
+"""add fts5 search index
+
+Revision ID: e7b94f1a2c38
+Revises: 5d8e2b4c7a10
+Create Date: 2026-01-27 11:40:08.915273
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b94f1a2c38'
+down_revision = '5d8e2b4c7a10'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of app.search.fts_tokens as of this revision, so later
+# changes to the app's tokenizer don't change what this migration writes
+CJK_RUN = re.compile(r'[\u3040-\u30ff\u3100-\u312f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+')
+
+
+def _bigrams(run):
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def fts_tokens(value):
+    if not value:
+        return ''
+
+    def expand(match):
+        run = match.group(0)
+        tokens = _bigrams(run)
+        if len(run) > 1:
+            tokens.append(run[-1])
+        return ' ' + ' '.join(tokens) + ' '
+
+    return CJK_RUN.sub(expand, value)
+
+
+def upgrade():
+    conn = op.get_bind()
+    if conn.dialect.name != 'sqlite':
+        return
+
+    # CJK text is pre-split into bigrams by app.search.fts_tokens, so the
+    # stock unicode61 tokenizer is enough here
+    op.execute(
+        "CREATE VIRTUAL TABLE search_index USING fts5("
+        "title, body, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+
+    insert = sa.text("INSERT INTO search_index (rowid, title, body) VALUES (:rowid, :title, :body)")
+    designs = conn.execute(sa.text("SELECT id, title, description, hashtags FROM design")).fetchall()
+    for design_id, title, description, hashtags in designs:
+        conn.execute(insert, {
+            'rowid': design_id * 2,
+            'title': fts_tokens(title),
+            'body': fts_tokens(f"{description or ''}\n{hashtags or ''}")
+        })
+    posts = conn.execute(sa.text("SELECT id, title, content FROM post")).fetchall()
+    for post_id, title, content in posts:
+        conn.execute(insert, {
+            'rowid': post_id * 2 + 1,
+            'title': fts_tokens(title),
+            'body': fts_tokens(content)
+        })
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TABLE search_index")
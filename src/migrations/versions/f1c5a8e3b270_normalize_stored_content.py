@@ -0,0 +1,50 @@
+"""normalize stored content
+
+Revision ID: f1c5a8e3b270
+Revises: b4d07e9a6f12
+Create Date: 2026-02-24 09:31:57.468102
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c5a8e3b270'
+down_revision = 'b4d07e9a6f12'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of app.content.normalize_content as of this revision, so
+# later changes to the app's normalisation don't change this backfill
+EXTRA_BLANK_LINES = re.compile(r'(\s*\n){3,}')
+
+
+def normalize_content(text):
+    if not text:
+        return text
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return EXTRA_BLANK_LINES.sub('\n\n', text)
+
+
+# (table, text column) pairs that used to go through the format_content filter
+COLUMNS = [('post', 'content'), ('comment', 'content'), ('design', 'description')]
+
+
+def upgrade():
+    # One-off backfill: new writes are normalized by the routes and importers
+    conn = op.get_bind()
+    for table, column in COLUMNS:
+        rows = conn.execute(sa.text(f"SELECT id, {column} FROM {table}")).fetchall()
+        update = sa.text(f"UPDATE {table} SET {column} = :value WHERE id = :id")
+        for row_id, value in rows:
+            normalized = normalize_content(value)
+            if normalized != value:
+                conn.execute(update, {'id': row_id, 'value': normalized})
+
+
+def downgrade():
+    # Normalization is lossy; nothing to undo
+    pass
@@ -1,5 +1,6 @@
 from app import create_app, db
 from app.models import User
+from app.users import user_cache
 
 app = create_app()
 with app.app_context():
@@ -7,6 +8,8 @@ with app.app_context():
     if user:
         user.is_admin = True
         db.session.commit()
+        # Running gunicorn workers drop their cached copy
+        user_cache.invalidate(user.id)
         print(f"Promoted user {user.name} ({user.email}) to Admin.")
     else:
         print("No users found in the database.")
@@ -0,0 +1,9 @@
+from app import create_app
+from app.hashtags import rebuild_hashtag_counts, rebuild_design_tags
+
+app = create_app()
+with app.app_context():
+    count = rebuild_hashtag_counts()
+    print(f"Rebuilt hashtag counts: {count} distinct tags.")
+    count = rebuild_design_tags()
+    print(f"Rebuilt design tag links: {count} distinct tags.")
@@ -0,0 +1,8 @@
+from app import create_app
+from app.models import Design, Post
+from app.search import rebuild_search_index
+
+app = create_app()
+with app.app_context():
+    rebuild_search_index()
+    print(f"Reindexed {Design.query.count()} designs and {Post.query.count()} posts.")
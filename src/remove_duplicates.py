@@ -1,5 +1,7 @@
 from app import create_app, db
 from app.models import Post, Comment
+from app.search import unindex_post
+from app.uploads import release_upload
 from collections import defaultdict
 
 app = create_app()
@@ -41,6 +43,9 @@ with app.app_context():
                     print(f"  Deleting duplicate ID {item.id}")
                     # Delete associated comments first just in case
                     Comment.query.filter_by(post_id=item.id).delete()
+                    unindex_post(item)
+                    # Shared blobs stay until their last reference goes
+                    release_upload(item.image_filename)
                     db.session.delete(item)
                     deleted_count += 1
 
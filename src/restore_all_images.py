@@ -1,91 +1,57 @@
+import argparse
 import os
-import glob
-from bs4 import BeautifulSoup
 from app import create_app, db
-from app.models import Post, Design
-from datetime import datetime
-import shutil
-
-# Copied helper
-def parse_html_file(fpath):
-    with open(fpath, 'r', encoding='utf-8') as f:
-        soup = BeautifulSoup(f, 'html.parser')
-
-    content_div = soup.find('div', class_='main-content')
-    content = content_div.get_text('\n').strip() if content_div else ""
-    
-    filename_base = os.path.basename(fpath).replace('.html', '')
-    if ' - ' in filename_base:
-        title_candidate = filename_base.split(' - ', 1)[1]
-    else:
-        title_candidate = filename_base
-        
-    if not content:
-        content = title_candidate
-    
-    title = title_candidate[:100]
-    return title, soup
+from app.fragments import bump_version
+from app.uploads import import_file
+from app.imports import ImportManifest
+from app.archive import load_index
+from app.reconcile import reconcile, load_targets, write_report
+from app.jobs import enqueue_image_jobs
 
 GPLUS_DIR = 'gplus/Google+ Communities/自己的國旗自己畫/Posts'
+COMMIT_EVERY = 200
+
+parser = argparse.ArgumentParser(description="Copy Takeout images onto posts and designs that lack one.")
+parser.add_argument('--report', help="Write the reconciliation report (JSON) to this file.")
+args = parser.parse_args()
 
 app = create_app()
 with app.app_context():
-    files = glob.glob(os.path.join(GPLUS_DIR, '*.html'))
-    print(f"Scanning {len(files)} files for missing images...")
-    
+    index = load_index(GPLUS_DIR)
+    manifest = ImportManifest(GPLUS_DIR)
+    print(f"Scanning {len(index)} files for missing images...")
+
+    # Matched against the database in bulk (see app.reconcile); only the
+    # rows that need an image or an import record are loaded
+    report = reconcile(index, manifest)
+    todo = [item for item in report['items']
+            if item['status'] == 'needs_image' or (item['status'] == 'present' and not item['recorded'])]
+    targets = load_targets(todo)
+    sha256 = {entry['path']: entry['sha256'] for entry in index.entries()}
+
     updated_count = 0
-    
-    for fpath in files:
-        title, soup = parse_html_file(fpath)
-        
-        # Check if exists in DB (Post or Design)
-        post = Post.query.filter_by(title=title).first()
-        design = Design.query.filter_by(title=title).first()
-        
-        target = post if post else design
-        target_type = "Post" if post else ("Design" if design else None)
-        
-        if target:
-            # Check if target already has image
-            if not target.image_filename:
-                # Target has no image, check if HTML supports one
-                image_filename = None
-                
-                # Check u-photo first
-                img_tag = soup.find('img', class_='u-photo')
-                # Fallback to media class
-                if not img_tag:
-                     img_tag = soup.find('img', class_='media')
-                     
-                if img_tag and img_tag.get('src'):
-                    src = img_tag['src']
-                    potential_img_name = os.path.basename(src)
-                    
-                    # Ignore generic GPlus avatar/icon placeholders if any
-                    # Usually real images are UUID-like or hashes. 
-                    # Let's assume valid if exists in folder.
-                    
-                    src_path = os.path.join(GPLUS_DIR, potential_img_name)
-                    if os.path.exists(src_path):
-                        # Copy to static/uploads
-                        target_dir = os.path.join(app.root_path, 'static', 'uploads')
-                        if not os.path.exists(target_dir):
-                            os.makedirs(target_dir)
-                        
-                        clean_img_name = potential_img_name.split('?')[0]
-                        import uuid
-                        ext = os.path.splitext(clean_img_name)[1]
-                        if not ext: ext = '.jpg'
-                        new_img_name = str(uuid.uuid4()) + ext
-                        
-                        shutil.copy(src_path, os.path.join(target_dir, new_img_name))
-                        
-                        target.image_filename = new_img_name
-                        updated_count += 1
-                        print(f"[{target_type}] Restored image for: {title[:30]}...")
+    for n, item in enumerate(todo, 1):
+        fpath = os.path.join(manifest.root, item['path'])
+        target = targets[(item['target_type'], item['target_id'])]
+
+        if item['status'] == 'needs_image':
+            # Copy to static/uploads; identical bytes reuse the stored file
+            target.image_filename = import_file(item['image_path'])
+            bump_version(target)
+            enqueue_image_jobs([target])  # variants and fingerprint, as for an upload
+            updated_count += 1
+            print(f"[{item['target_type']}] Restored image for: {item['title'][:30]}...")
+        manifest.record(fpath, target, sha256=sha256[fpath])
+
+        # Commit as we go so an interrupted run keeps its progress
+        if n % COMMIT_EVERY == 0:
+            db.session.commit()
 
+    db.session.commit()
+    if args.report:
+        write_report(report, args.report)
+    print(f"Reconciled in {report['seconds']}s: {report['counts']}")
     if updated_count > 0:
-        db.session.commit()
         print(f"Successfully restored images for {updated_count} items.")
     else:
         print("No items found needing image restoration.")
@@ -1,31 +1,24 @@
 import os
-import glob
-from bs4 import BeautifulSoup
+from collections import Counter
+from app import create_app
+from app.archive import load_index
 
 base_path = 'gplus/Google+ Communities/自己的國旗自己畫/Posts'
-files = glob.glob(os.path.join(base_path, '*.html'))
 
-print(f"Found {len(files)} files.")
+app = create_app()
+with app.app_context():
+    index = load_index(base_path)
+    print(f"Found {len(index)} files.")
 
-categories_found = set()
-count = 0
-for fpath in files:
-    if count > 50: break
-    try:
-        with open(fpath, 'r', encoding='utf-8') as f:
-            soup = BeautifulSoup(f, 'html.parser')
-            visibility = soup.find('div', class_='visibility')
-            if visibility:
-                text = visibility.get_text().strip()
-                # Expected: "Shared to the community 自己的國旗自己畫 - Category" or " - Public"
-                if '-' in text:
-                    parts = text.split('-')
-                    if len(parts) >= 2:
-                        cat = parts[-1].strip()
-                        categories_found.add(cat)
-                        print(f"File: {os.path.basename(fpath)} -> Cat: {cat}")
-    except Exception as e:
-        print(f"Error {fpath}: {e}")
-    count += 1
+    # Visibility line: "Shared to the community 自己的國旗自己畫 - Category" or " - Public"
+    categories_found = Counter()
+    for count, entry in enumerate(index.entries()):
+        if entry['category'] is None:
+            continue
+        categories_found[entry['category']] += 1
+        if count <= 50:
+            print(f"File: {os.path.basename(entry['path'])} -> Cat: {entry['category']}")
 
-print("\nCategories Found:", categories_found)
+    print("\nCategories Found:")
+    for cat, n in categories_found.most_common():
+        print(f"  {cat}: {n}")
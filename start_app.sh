@@ -26,7 +26,25 @@ fi
 # --timeout 60: Increase timeout for image uploads (60 seconds)
 echo "Starting TW Flag Design App with Gunicorn (Threaded) on port 8000..."
 cd src
-exec $UV gunicorn -w 3 --threads 4 --worker-class gthread --timeout 60 \
+mkdir -p ../log
+
+# Background job worker (thumbnails, search index updates), restarted if it
+# exits; stopped with the app. Under systemd or the container setup, run
+# `flask run-worker` as its own service instead
+(
+    trap 'kill $CHILD 2>/dev/null; exit' TERM
+    while true; do
+        $UV flask run-worker >> ../log/worker.log 2>&1 &
+        CHILD=$!
+        wait $CHILD
+        echo "$(date -u +%FT%TZ) job worker exited with status $?, restarting in 5s" >> ../log/worker.log
+        sleep 5
+    done
+) &
+WORKER_PID=$!
+trap 'kill $WORKER_PID 2>/dev/null' EXIT
+
+$UV gunicorn -w 3 --threads 4 --worker-class gthread --timeout 60 \
     --access-logfile ../log/gunicorn-access.log \
     --error-logfile ../log/gunicorn-error.log \
     -b 0.0.0.0:8000 "app:create_app()"